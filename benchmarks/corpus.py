@@ -0,0 +1,86 @@
+"""
+基准测试使用的合成字幕语料
+
+生成的字幕在长度、说话人标签、多行字幕、重复短句、音乐符号等方面接近真实的剧集字幕，
+同一个随机种子总是生成相同的内容，不同次运行的结果可以直接比较。
+"""
+import random
+
+from core.srt_stream import ms_to_timestamp
+
+
+SPEAKERS = ("MATT", "MARISHA", "LAURA", "SAM", "TRAVIS", "LIAM", "TALIESIN", "ASHLEY")
+WORDS = (
+    "the", "a", "you", "we", "I", "it", "that", "to", "and", "of", "in", "is", "what", "this",
+    "right", "just", "like", "so", "know", "go", "get", "think", "going", "okay", "there", "back",
+    "dragon", "spell", "castle", "sword", "tavern", "ritual", "forest", "guard", "portal", "gold",
+    "Fireball", "Mordenkainen", "Whitestone", "Vox Machina", "initiative", "roll", "damage",
+    "actually", "maybe", "never", "again", "together", "before", "after", "inside", "quickly",
+)
+# 一季中反复出现的短句
+COMMON_LINES = ("Yeah.", "What?", "Okay.", "Right.", "No.", "Oh no.", "Let's go.", "[LAUGHTER]", "Thank you.")
+MUSIC_LINES = ("♪♪", "♪ (music) ♪")
+CJK_WORDS = (
+    "我们", "你", "他", "这个", "那个", "城堡", "巨龙", "法术", "酒馆", "守卫", "传送门", "金币",
+    "「火球术」", "「魔邓肯」", "灰颅堡", "先攻", "伤害", "真的", "也许", "一起", "马上", "然后", "可是",
+)
+
+
+def _sentence(rng, min_words=3, max_words=12):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    words[0] = words[0][:1].upper() + words[0][1:]
+    return " ".join(words) + rng.choice((".", ".", ".", "?", "!", ","))
+
+
+def _cjk_sentence(rng, min_words=3, max_words=10):
+    return "".join(rng.choice(CJK_WORDS) for _ in range(rng.randint(min_words, max_words))) + rng.choice("。。？！，")
+
+
+def cue_text(rng, style='en'):
+    """生成一条字幕文本；style 为 'en'（英文原文）、'zh'（中文译文）或 'tagged'（带 <i> 和 {\\an8} 标签）"""
+    if style == 'zh':
+        text = _cjk_sentence(rng)
+        if rng.random() < 0.3:
+            text = f"{rng.choice(SPEAKERS)}：{text}"
+        return text
+    roll = rng.random()
+    if roll < 0.08:
+        return rng.choice(COMMON_LINES)
+    if roll < 0.10:
+        return rng.choice(MUSIC_LINES)
+    text = _sentence(rng)
+    if rng.random() < 0.3:
+        text = f"{rng.choice(SPEAKERS)}: {text}"
+    if rng.random() < 0.25:
+        text += "\n" + _sentence(rng, 2, 8)
+    if style == 'tagged' and rng.random() < 0.3:
+        text = rng.choice(("<i>{}</i>", "{{\\an8}}{}", "<font color=\"#ffff00\">{}</font>")).format(text)
+    return text
+
+
+def make_srt(count, seed=0, style='en', newline='\n'):
+    """
+    生成包含 count 条字幕的 SRT 文本
+
+    :param style: 字幕文本的风格，见 cue_text()
+    :param newline: 换行符，Windows 工具导出的字幕为 '\r\n'
+    """
+    rng = random.Random(seed)
+    parts = []
+    start = 1000
+    for index in range(1, count + 1):
+        duration = rng.randint(800, 4500)
+        end = start + duration
+        parts.append(f"{index}\n{ms_to_timestamp(start)} --> {ms_to_timestamp(end)}\n{cue_text(rng, style)}\n\n")
+        start = end + rng.randint(40, 1500)
+    content = "".join(parts)
+    if newline != '\n':
+        content = content.replace('\n', newline)
+    return content
+
+
+def write_srt(path, count, seed=0, encoding='utf-8', style='en', newline='\n'):
+    """把合成字幕按指定编码写入文件（encoding='utf-8-sig' 时带BOM），返回文件路径"""
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write(make_srt(count, seed, style, newline))
+    return path
@@ -0,0 +1,342 @@
+"""
+CPU 热点路径的微基准
+
+覆盖每条字幕都会经过的本地计算：
+    parse_subtitles     解析SRT文本（LF、CRLF+BOM+格式标签、中文三种语料）
+    parse_track         解析为 SubtitleTrack（处理文件时实际使用的结构）
+    prompt_building     逐条翻译时的上下文切片与提示词拼接（safe_translate_subtitle 发请求前的全部工作）
+    batch_planning      批量模式的分批与编号提示词拼接
+    count_tokens        token计数（清空缓存后的首次计数，以及缓存命中）
+    rebuild_subtitles   生成译文SRT
+    detect_encoding     FileHandler.detect_encoding（UTF-8 和 GBK 文件）
+
+每一轮先运行一段固定的纯 Python 校准负载（字符串切分、正则、字典、排序），紧接着运行被测项目，
+取各轮“项目耗时 / 校准耗时”比值的中位数，再与 benchmarks/baselines.json 中保存的基线比较，
+以抵消机器速度和运行期间负载波动的影响。超过阈值（默认 30%）的项目会重新测量，
+仍然变慢时以退出码 1 结束。基线按 Python 实现与版本、CPU 架构分别保存；
+没有当前环境的基线时，与最接近的环境（相同实现和架构、版本最近）的基线比较，
+阈值放宽为 --cross-env-threshold（默认 60%）。完全没有可用的基线时以退出码 2 结束，
+除非指定 --allow-missing-baseline。
+
+    python -m benchmarks.micro                  # 与基线比较
+    python -m benchmarks.micro --update         # 以本次结果更新基线
+    python -m benchmarks.micro --only parse     # 只运行名称包含 parse 的项目
+"""
+import os
+import sys
+import json
+import re
+import time
+import argparse
+import statistics
+import tempfile
+import platform
+
+from benchmarks.corpus import make_srt, write_srt
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_THRESHOLD = 0.30
+DEFAULT_CUES = 5000
+# 每轮至少连续运行这么久，取多轮的中位数
+MIN_RUN_SECONDS = 0.2
+REPEATS = 5
+# 与其他环境的基线比较时使用的阈值
+DEFAULT_CROSS_ENV_THRESHOLD = 0.60
+# 超过阈值的项目最多重新测量的次数
+RECHECKS = 2
+
+VOCAB = [
+    "Fireball：「火球术」", "Mordenkainen：「魔邓肯」", "Whitestone：「灰颅堡」", "Vox Machina：「机械之声」",
+    "initiative：先攻", "MARISHA：玛丽莎", "LAURA：劳拉", "TRAVIS：特拉维斯",
+] + [f"Term{number}：术语{number}" for number in range(200)]
+
+
+_CALIBRATION_LINES = [
+    f"{number}\n00:00:{number % 60:02d},000 --> 00:00:{number % 60:02d},500\nLine {number % 977}: the <i>dragon</i> said hi."
+    for number in range(2000)
+]
+_CALIBRATION_PATTERN = re.compile(r"(\d{2}):(\d{2}),(\d{3})")
+
+
+def calibration_workload():
+    """固定的纯 Python 负载（与被测代码相近的字符串切分、正则、字典和排序），用于换算机器速度"""
+    counts = {}
+    total = 0
+    for block in _CALIBRATION_LINES:
+        index, timing, text = block.split("\n")
+        total += sum(int(part) for match in _CALIBRATION_PATTERN.finditer(timing) for part in match.groups())
+        for word in text.replace("<i>", "").replace("</i>", "").lower().split():
+            counts[word] = counts.get(word, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:10], total
+
+
+def _loop_count(func):
+    """每轮调用次数：使一轮至少运行 MIN_RUN_SECONDS"""
+    number = 1
+    while True:
+        elapsed = _run(func, number)
+        if elapsed >= MIN_RUN_SECONDS:
+            return number
+        number *= 2 if elapsed * 4 >= MIN_RUN_SECONDS else 10
+
+
+def _run(func, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def measure(func, calibration_number):
+    """
+    交替运行校准负载和被测项目
+
+    :return: (单次调用耗时的中位数（秒）, 相对校准负载的耗时比值的中位数)
+    """
+    number = _loop_count(func)
+    seconds, ratios = [], []
+    for _ in range(REPEATS):
+        calibration = _run(calibration_workload, calibration_number) / calibration_number
+        elapsed = _run(func, number) / number
+        seconds.append(elapsed)
+        ratios.append(elapsed / calibration)
+    return statistics.median(seconds), statistics.median(ratios)
+
+
+class Corpora:
+    """基准使用的语料：合成英文、Windows 风格（CRLF、BOM、格式标签）和中文译文"""
+
+    def __init__(self, cues, workdir):
+        self.texts = {
+            'synthetic': make_srt(cues, seed=1),
+            'crlf_tagged': '\ufeff' + make_srt(cues, seed=2, style='tagged', newline='\r\n'),
+            'cjk': make_srt(cues, seed=3, style='zh'),
+        }
+        # 编码检测读取整个文件，用较小的文件即可反映耗时
+        detect_cues = max(1, cues // 5)
+        self.files = {
+            'utf8': write_srt(os.path.join(workdir, 'utf8.srt'), detect_cues, seed=4),
+            'gbk': write_srt(os.path.join(workdir, 'gbk.srt'), detect_cues, seed=5, encoding='gbk', style='zh'),
+        }
+
+
+def build_benchmarks(corpora):
+    """返回 [(名称, 无参可调用对象)]"""
+    from core import tokenizer
+    from core.subtitle_track import SubtitleTrack
+    from core.subtitle_translator import SmartSubtitleTranslator
+
+    translator = SmartSubtitleTranslator(None, custom_vocab=VOCAB, max_tokens=2000)
+    translator.context_summary = "这是一部奇幻桌面角色扮演游戏的实况节目。" * 20
+    subtitles = SubtitleTrack.parse(corpora.texts['synthetic'])
+    texts = list(subtitles.texts())
+    translated_texts = [f"译：{text}" for text in texts]
+    # 模拟翻译进行到一半：前半部分已有译文
+    half_translated = translated_texts[:len(texts) // 2] + [None] * (len(texts) - len(texts) // 2)
+
+    def prompt_building():
+        for position in range(len(subtitles)):
+            prev_context, next_text = translator.get_context(position, subtitles, half_translated)
+            translator.build_translation_prompt(subtitles[position], prev_context, next_text)
+
+    def batch_planning():
+        for positions in translator.split_batches(subtitles):
+            translator.build_batch_prompt(positions, subtitles, half_translated)
+
+    def count_tokens_cold():
+        tokenizer._count_memoized.cache_clear()
+        for text in texts:
+            tokenizer.count_tokens(text)
+
+    def count_tokens_warm():
+        for text in texts:
+            tokenizer.count_tokens(text)
+
+    benchmarks = [
+        (f"parse_subtitles[{name}]", lambda content=content: translator.parse_subtitles(content))
+        for name, content in corpora.texts.items()
+    ]
+    benchmarks += [
+        (f"parse_track[{name}]", lambda content=content: SubtitleTrack.parse(content))
+        for name, content in corpora.texts.items()
+    ]
+    benchmarks += [
+        ("prompt_building", prompt_building),
+        ("batch_planning", batch_planning),
+        ("count_tokens[cold]", count_tokens_cold),
+        ("count_tokens[warm]", count_tokens_warm),
+        ("rebuild_subtitles", lambda: translator.rebuild_subtitles(subtitles, translated_texts)),
+    ]
+
+    try:
+        from core.file_handler import FileHandler
+    except ImportError as e:
+        # 文件处理模块依赖 chardet 和 tkinter
+        print(f"跳过 detect_encoding: {e}", file=sys.stderr)
+    else:
+        benchmarks += [
+            (f"detect_encoding[{name}]", lambda path=path: FileHandler.detect_encoding(path))
+            for name, path in corpora.files.items()
+        ]
+    return benchmarks
+
+
+def load_baselines(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def environment_key():
+    """基线对应的运行环境：Python 实现与主次版本、CPU 架构"""
+    version = ".".join(platform.python_version_tuple()[:2])
+    return f"{platform.python_implementation()}-{version}-{platform.machine()}"
+
+
+def closest_baseline(baselines, tokenizer_mode, cues):
+    """
+    选择可比较的基线：优先当前环境，否则取相同 Python 实现和CPU架构、版本最接近的环境
+
+    :return: (基线键, 基线)，没有相同 token 计数方式和字幕条数的基线时返回 (None, {})
+    """
+    current = environment_key()
+    suffix = f"/{tokenizer_mode}/{cues}"
+    candidates = [key for key in baselines if key.endswith(suffix)]
+    if not candidates:
+        return None, {}
+    implementation, version, machine = current.split('-', 2)
+    minor = int(version.split('.')[1])
+
+    def distance(key):
+        other_implementation, other_version, other_machine = key[:-len(suffix)].split('-', 2)
+        return (
+            key != current + suffix,
+            other_implementation != implementation,
+            other_machine != machine,
+            abs(int(other_version.split('.')[1]) - minor),
+            key,
+        )
+
+    key = min(candidates, key=distance)
+    return key, baselines[key]
+
+
+def compare(results, baseline, threshold):
+    """
+    与基线比较
+
+    :param results: {名称: (耗时, 相对校准负载的比值)}
+    :return: [(名称, 耗时, 基线耗时或None, 相对基线的比值或None, 是否退化)]
+    """
+    rows = []
+    base_results = baseline.get('results', {})
+    base_normalized = baseline.get('normalized', {})
+    for name, (seconds, normalized) in results.items():
+        base = base_normalized.get(name)
+        if base is None:
+            rows.append((name, seconds, None, None, False))
+            continue
+        ratio = normalized / base
+        rows.append((name, seconds, base_results.get(name), ratio, ratio > 1 + threshold))
+    return rows
+
+
+def format_rows(rows):
+    lines = [f"{'项目':<28} {'耗时(ms)':>10} {'基线(ms)':>10} {'比值':>7}  状态"]
+    for name, seconds, base_seconds, ratio, regressed in rows:
+        base_text = f"{base_seconds * 1000:>10.3f}" if base_seconds is not None else f"{'-':>10}"
+        ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        status = "退化" if regressed else ("新增" if ratio is None else "正常")
+        lines.append(f"{name:<28} {seconds * 1000:>10.3f} {base_text} {ratio_text}  {status}")
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="CPU 热点路径的微基准")
+    parser.add_argument('--cues', type=int, default=DEFAULT_CUES, help=f"语料的字幕条数（默认 {DEFAULT_CUES}，须与基线一致）")
+    parser.add_argument('--tokenizer', choices=['auto', 'tiktoken', 'approx'], default='approx',
+                        help="token计数方式（默认 approx，结果不受本地编码文件影响；基线按方式分别保存）")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="允许的变慢比例（默认 0.30）")
+    parser.add_argument('--cross-env-threshold', type=float, default=DEFAULT_CROSS_ENV_THRESHOLD,
+                        help="没有当前环境的基线、与其他环境的基线比较时允许的变慢比例（默认 0.60）")
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help="没有可用的基线时只报告耗时，以退出码 0 结束")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument('--only', help="只运行名称包含该字符串的项目")
+    parser.add_argument('--update', action='store_true', help="以本次结果更新基线")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from core import tokenizer
+    tokenizer.configure(args.tokenizer)
+
+    baselines = load_baselines(args.baseline)
+    baseline_key = f"{environment_key()}/{args.tokenizer}/{args.cues}"
+    # 当前环境的基线（--update 时在其基础上合并）和实际用于比较的基线
+    baseline = baselines.get(baseline_key, {})
+    reference_key, reference = closest_baseline(baselines, args.tokenizer, args.cues)
+    threshold = args.threshold if reference_key == baseline_key else args.cross_env_threshold
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpora = Corpora(args.cues, workdir)
+        benchmarks = build_benchmarks(corpora)
+        if args.only:
+            benchmarks = [(name, func) for name, func in benchmarks if args.only in name]
+        calibration_number = _loop_count(calibration_workload)
+        results = {}
+        for name, func in benchmarks:
+            print(f"运行 {name}...", file=sys.stderr)
+            results[name] = measure(func, calibration_number)
+
+        rows = compare(results, reference, threshold)
+        # 超过阈值的项目重新测量，取比值最小的一次，排除偶发的负载波动
+        functions = dict(benchmarks)
+        for _ in range(RECHECKS):
+            regressed = [row[0] for row in rows if row[4]]
+            if not regressed or args.update:
+                break
+            for name in regressed:
+                print(f"重新测量 {name}...", file=sys.stderr)
+                results[name] = min(results[name], measure(functions[name], calibration_number), key=lambda item: item[1])
+            rows = compare(results, reference, threshold)
+    if reference_key is not None and reference_key != baseline_key:
+        print(f"没有 {baseline_key} 的基线，与 {reference_key} 的基线比较（阈值 {threshold:.0%}）")
+    print(format_rows(rows))
+
+    if args.update:
+        # 合并结果：--only 只运行部分项目时保留其余项目的基线
+        seconds = dict(baseline.get('results', {}))
+        normalized = dict(baseline.get('normalized', {}))
+        for name, (elapsed, ratio) in results.items():
+            seconds[name] = elapsed
+            normalized[name] = ratio
+        baselines[baseline_key] = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': dict(sorted(seconds.items())),
+            'normalized': dict(sorted(normalized.items())),
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"基线已更新：{args.baseline}（{baseline_key}）")
+        return 0
+
+    if reference_key is None:
+        print(f"没有 {args.tokenizer}/{args.cues} 的基线，使用 --update 创建")
+        return 0 if args.allow_missing_baseline else 2
+    regressed = [row[0] for row in rows if row[4]]
+    if regressed:
+        print(f"以下项目比基线慢 {threshold:.0%} 以上：{', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+本地模拟的 OpenAI 兼容翻译服务
+
+实现 POST /chat/completions（流式和非流式），用于在不调用真实服务商的情况下测量吞吐量：
+    - 响应延迟按指定分布抽样，另按输出token数加上生成时间
+    - 按比例注入 429（带 Retry-After）和 500 错误，或按每分钟请求数真实限流
+    - 用 core.tokenizer 统计输入/输出token，写入响应的 usage 字段
+    - GET /stats 返回累计统计，POST /stats/reset 清零
+
+只依赖标准库。单独运行：
+    python -m benchmarks.mock_server --port 8000 --latency lognormal:0.6:0.4 --rate-429 0.02
+然后把 API 地址设为 http://127.0.0.1:8000/v1（任意 API Key）。
+"""
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.tokenizer import count_tokens
+
+
+# 每条消息的格式开销（与 OpenAI 的计费方式相近）
+MESSAGE_OVERHEAD_TOKENS = 3
+# 流式响应中每个增量包含的字符数
+STREAM_CHUNK_CHARS = 8
+
+ANALYSIS_REPORT = (
+    "1. 内容类型：奇幻桌面角色扮演游戏的实况节目\n"
+    "2. 主要主题：冒险小队探索城堡、调查仪式并与巨龙对抗\n"
+    "3. 关键人物：MATT（马特，主持人）、MARISHA（玛丽莎）、LAURA（劳拉）、SAM（萨姆）\n"
+    "4. 地点：Whitestone（灰颅堡）、tavern（酒馆）\n"
+    "5. 专有名词：Fireball（「火球术」）、Mordenkainen（「魔邓肯」）、Vox Machina（「机械之声」）\n"
+    "6. 语言风格：口语化、轻松幽默，夹杂游戏术语\n"
+    "7. 目标受众：桌面角色扮演游戏爱好者"
+)
+
+_NUMBERED_LINE_PATTERN = re.compile(r'^\[(\d+)\]\s*(.*)$')
+
+
+class LatencyModel:
+    """
+    响应延迟分布
+
+    规格写法：
+        fixed:0.5              固定 0.5 秒
+        uniform:0.2:1.0        0.2～1.0 秒均匀分布
+        normal:0.6:0.2         均值 0.6 秒、标准差 0.2 秒（截断为非负）
+        lognormal:0.6:0.5      中位数 0.6 秒、对数标准差 0.5（长尾，最接近真实服务）
+        exp:0.6                均值 0.6 秒的指数分布
+    """
+
+    def __init__(self, spec='fixed:0'):
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        try:
+            values = [float(value) for value in params.split(':')] if params else []
+        except ValueError:
+            raise ValueError(f"无法解析延迟分布: {spec}")
+        samplers = {
+            'fixed': (1, lambda rng, value: value),
+            'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+            'normal': (2, lambda rng, mean, std: rng.gauss(mean, std)),
+            'lognormal': (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0),
+            'exp': (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+        }
+        if kind not in samplers or len(values) != samplers[kind][0]:
+            raise ValueError(f"无法解析延迟分布: {spec}，可选 {', '.join(samplers)}")
+        self._sampler = samplers[kind][1]
+        self._values = values
+
+    def sample(self, rng):
+        return max(0.0, self._sampler(rng, *self._values))
+
+
+class MockStats:
+    """模拟服务的累计统计，所有请求线程共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.responses = {}  # {状态码: 次数}
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.latencies = []  # 成功响应的服务端耗时（秒）
+
+    def record(self, status, prompt_tokens=0, completion_tokens=0, latency=None):
+        with self._lock:
+            self.requests += 1
+            self.responses[status] = self.responses.get(status, 0) + 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'responses': {str(status): count for status, count in sorted(self.responses.items())},
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'mean_latency': sum(self.latencies) / len(self.latencies) if self.latencies else 0.0,
+            }
+
+
+def _cue_lines(content):
+    """取出用户消息中 "待翻译文本" 之后的字幕行，没有该标记时返回None"""
+    lines = content.split('\n')
+    marker = None
+    for number, line in enumerate(lines):
+        if line.startswith('待翻译文本'):
+            marker = number
+    if marker is None:
+        return None
+    cue_lines = []
+    for line in lines[marker + 1:]:
+        if not line.strip():
+            break
+        cue_lines.append(line)
+    return cue_lines
+
+
+def fake_completion(messages, chatter=0):
+    """
+    根据请求内容生成模拟的译文
+
+    编号请求逐行返回 "[编号] 译：原文"，单条请求返回一行译文，其他请求（如内容分析）返回固定报告。
+    :param chatter: 译文之后附加的解释文字的字数，模拟模型多余的输出
+    """
+    content = messages[-1].get('content', '') if messages else ''
+    cue_lines = _cue_lines(content)
+    if cue_lines is None:
+        return ANALYSIS_REPORT
+    numbered = [_NUMBERED_LINE_PATTERN.match(line) for line in cue_lines]
+    if numbered and all(numbered):
+        text = "\n".join(f"[{match.group(1)}] 译：{match.group(2)}" for match in numbered)
+    else:
+        text = "译：" + " ".join(line.strip() for line in cue_lines)
+    if chatter:
+        text += "\n解释：" + "这句话的语气比较轻松。" * max(1, chatter // 10)
+    return text
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端提前断开流式响应或关闭空闲连接属于正常情况
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockLLMServer:
+    """
+    在后台线程中运行的模拟服务
+
+    :param latency: 首个token之前的延迟分布（LatencyModel 规格）
+    :param token_latency: 每个输出token的生成时间（秒）
+    :param rate_429: 随机返回 429 的比例
+    :param rate_500: 随机返回 500 的比例
+    :param retry_after: 429 响应的 Retry-After（秒）
+    :param rpm: 每分钟请求数上限，超出时返回 429；None 表示不限
+    :param chatter: 译文之后附加的多余文字的字数
+    :param seed: 随机种子
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', token_latency=0.0, rate_429=0.0,
+                 rate_500=0.0, retry_after=1.0, rpm=None, chatter=0, seed=None):
+        self.latency = LatencyModel(latency)
+        self.token_latency = token_latency
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.chatter = chatter
+        self.stats = MockStats()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._request_times = deque()
+        self._httpd = _QuietHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """在后台线程中开始服务"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程中服务，直到被中断"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _sample_latency(self):
+        with self._rng_lock:
+            return self.latency.sample(self._rng)
+
+    def injected_error(self):
+        """决定本次请求是否返回错误，返回状态码或None"""
+        if self.rpm:
+            now = time.monotonic()
+            with self._rng_lock:
+                while self._request_times and now - self._request_times[0] >= 60:
+                    self._request_times.popleft()
+                if len(self._request_times) >= self.rpm:
+                    return 429
+                self._request_times.append(now)
+        roll = self._random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_500:
+            return 500
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/stats'):
+                    self._send_json(200, server.stats.snapshot())
+                else:
+                    self._send_json(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length)
+                if self.path.rstrip('/').endswith('/stats/reset'):
+                    server.stats.reset()
+                    self._send_json(200, {'ok': True})
+                    return
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'not found'}})
+                    return
+                try:
+                    payload = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._send_json(400, {'error': {'message': 'invalid JSON'}})
+                    return
+                server.handle_completion(self, payload)
+
+        return Handler
+
+    def handle_completion(self, handler, payload):
+        started = time.monotonic()
+        messages = payload.get('messages') or []
+        prompt_tokens = sum(count_tokens(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+                            for message in messages) + MESSAGE_OVERHEAD_TOKENS
+
+        error = self.injected_error()
+        if error is not None:
+            # 错误响应也要等待一段时间，与真实服务一样占用连接
+            time.sleep(self._sample_latency() / 4)
+            headers = {'Retry-After': f"{self.retry_after:g}"} if error == 429 else None
+            message = 'Rate limit reached' if error == 429 else 'Internal server error'
+            handler._send_json(error, {'error': {'message': message, 'type': 'mock_error'}}, headers)
+            self.stats.record(error)
+            return
+
+        text = fake_completion(messages, self.chatter)
+        finish_reason = 'stop'
+        for stop in payload.get('stop') or []:
+            cut = text.find(stop)
+            if cut >= 0:
+                text = text[:cut]
+        completion_tokens = count_tokens(text)
+        max_tokens = payload.get('max_tokens')
+        if max_tokens and completion_tokens > max_tokens:
+            text = text[:max(1, len(text) * max_tokens // completion_tokens)]
+            completion_tokens = count_tokens(text)
+            finish_reason = 'length'
+
+        time.sleep(self._sample_latency())
+        model = payload.get('model', 'mock')
+        if not payload.get('stream'):
+            time.sleep(completion_tokens * self.token_latency)
+            handler._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                             'finish_reason': finish_reason}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+            self.stats.record(200, prompt_tokens, completion_tokens, time.monotonic() - started)
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+        sent_tokens = 0
+        try:
+            for offset in range(0, len(text), STREAM_CHUNK_CHARS):
+                piece = text[offset:offset + STREAM_CHUNK_CHARS]
+                piece_tokens = count_tokens(piece)
+                time.sleep(piece_tokens * self.token_latency)
+                chunk = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                handler._send_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                sent_tokens += piece_tokens
+            final = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'model': model,
+                     'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}],
+                     'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': sent_tokens,
+                               'total_tokens': prompt_tokens + sent_tokens}}
+            handler._send_chunk(f"data: {json.dumps(final, ensure_ascii=False)}\n\n".encode('utf-8'))
+            handler._send_chunk(b'data: [DONE]\n\n')
+            handler.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端收到所需行数后提前断开，只计入已发送的token
+            handler.close_connection = True
+        self.stats.record(200, prompt_tokens, sent_tokens, time.monotonic() - started)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_server", description="本地模拟的 OpenAI 兼容翻译服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', default='lognormal:0.6:0.4', help="首token延迟分布，如 fixed:0.5、lognormal:0.6:0.4")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="每个输出token的生成时间（秒）")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="随机返回 429 的比例")
+    parser.add_argument('--rate-500', type=float, default=0.0, help="随机返回 500 的比例")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument('--rpm', type=int, help="每分钟请求数上限，超出时返回 429")
+    parser.add_argument('--chatter', type=int, default=0, help="译文后附加的多余解释字数")
+    parser.add_argument('--seed', type=int)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = MockLLMServer(
+        host=args.host, port=args.port, latency=args.latency, token_latency=args.token_latency,
+        rate_429=args.rate_429, rate_500=args.rate_500, retry_after=args.retry_after,
+        rpm=args.rpm, chatter=args.chatter, seed=args.seed
+    )
+    print(f"模拟服务已启动：{server.base_url}（Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+回归检查（使用本地模拟服务）
+
+检查曾经出现过、单元级别的代码审查不容易发现的问题，任何一项失败时以退出码 1 结束：
+
+    python -m benchmarks.regression                # 运行全部检查
+    python -m benchmarks.regression --only stream  # 只运行名称包含 stream 的检查
+
+每项检查在后台线程中运行并设有时限，卡死也会被报告为失败。
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+from benchmarks.mock_server import MockLLMServer
+
+
+# 每项检查的默认时限（秒）
+DEFAULT_DEADLINE = 60
+
+CHECKS = []
+
+
+def check(func):
+    """注册一项检查；检查函数失败时抛出 AssertionError"""
+    CHECKS.append(func)
+    return func
+
+
+@check
+def streaming_errors_release_connections():
+    """流式模式下连续的 429/500 响应不会占住连接池中的连接"""
+    import requests
+    from core.translator import Translator
+
+    pool_size = 2
+    with MockLLMServer(rate_429=0.5, rate_500=0.5, retry_after=0.01, seed=1) as server:
+        translator = Translator({
+            'base_url': server.base_url,
+            'api_key': 'mock',
+            'model': 'mock-model',
+            'stream': True,
+            'pool_size': pool_size,
+        })
+        try:
+            # 错误次数远多于连接池大小：泄漏的连接会让之后的请求一直等待空闲连接
+            for _ in range(pool_size * 5):
+                try:
+                    translator.translate("Hello there.", system_prompt="Translate.")
+                except requests.HTTPError:
+                    continue
+                raise AssertionError("模拟服务应当对每个请求返回错误")
+        finally:
+            translator.close()
+
+
+@check
+def exhausted_pool_does_not_block():
+    """连接池中的连接全部被占用时，新的请求仍能完成，不会无限期等待空闲连接"""
+    from core.translator import Translator
+
+    pool_size = 2
+    with MockLLMServer(seed=3) as server:
+        translator = Translator({
+            'base_url': server.base_url,
+            'api_key': 'mock',
+            'model': 'mock-model',
+            'stream': False,
+            'pool_size': pool_size,
+        })
+        # 未读取的流式响应一直占用连接
+        held = [
+            translator.session.post(
+                f"{server.base_url}/chat/completions",
+                json={'model': 'mock-model', 'messages': [{'role': 'user', 'content': 'Hi.'}]},
+                stream=True
+            )
+            for _ in range(pool_size)
+        ]
+        try:
+            assert translator.translate("Hello there.", system_prompt="Translate."), "没有收到译文"
+        finally:
+            for response in held:
+                response.close()
+            translator.close()
+
+
+@check
+def streaming_pipeline_recovers_from_errors():
+    """流式模式下注入 429/500 错误时，逐条翻译的完整流程能在时限内结束（退避后重试成功）"""
+    from benchmarks.throughput import build_parser, run_once
+
+    args = build_parser().parse_args(['--workers', '4', '--retry-delay-base', '0.05'])
+    with MockLLMServer(rate_429=0.1, rate_500=0.1, retry_after=0.05, seed=2) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        result = run_once(server, 120, args, workdir)
+    assert result['requests'] > result['responses'].get('200', 0), "模拟服务没有返回任何错误"
+
+
+@check
+def pipeline_respects_worker_budget():
+    """多文件流水线中分段分析的请求也受全局并发数限制，同时进行的请求不超过 max_workers"""
+    from benchmarks.corpus import write_srt
+    from core.translator import Translator
+    from core.pipeline import MultiFilePipeline
+
+    max_workers = 4
+    active = peak = 0
+    lock = threading.Lock()
+    with MockLLMServer(latency='fixed:0.05', seed=4) as server, tempfile.TemporaryDirectory() as workdir:
+        translator = Translator({'base_url': server.base_url, 'api_key': 'mock', 'model': 'mock-model'})
+        translate = translator.translate
+
+        def counted_translate(*args, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            try:
+                return translate(*args, **kwargs)
+            finally:
+                with lock:
+                    active -= 1
+
+        translator.translate = counted_translate
+        file_paths = [write_srt(f"{workdir}/ep{number}.srt", 80, seed=number) for number in range(6)]
+        pipeline = MultiFilePipeline(
+            translator, max_workers=max_workers, output_dir=workdir, metrics_format='none',
+            analysis_mode='chunked', analysis_chunk_tokens=200
+        )
+        try:
+            jobs = pipeline.run(file_paths, 'Chinese')
+        finally:
+            translator.close()
+    assert all(job.error is None for job in jobs), "有文件处理失败"
+    assert peak <= max_workers, f"同时进行的请求数达到 {peak}，超过 max_workers={max_workers}"
+
+
+@check
+def dedup_claim_released_on_error():
+    """认领了去重键的翻译在发请求前抛出异常时释放认领，等待相同文本的线程不会一直阻塞"""
+    from core.dedup import CueDeduplicator
+    from core.subtitle_track import SubtitleTrack
+    from core.subtitle_translator import SmartSubtitleTranslator
+
+    deduplicator = CueDeduplicator()
+    subtitle_translator = SmartSubtitleTranslator(None, deduplicator=deduplicator)
+    subtitles = SubtitleTrack.parse("1\n00:00:01,000 --> 00:00:02,000\nYeah.\n")
+
+    def broken_context(*args, **kwargs):
+        raise RuntimeError("模拟构建提示词时的异常")
+
+    subtitle_translator.get_context = broken_context
+    try:
+        subtitle_translator.translate_deduplicated(0, subtitles, [None])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("应当抛出构建提示词时的异常")
+
+    # 认领已释放：再次认领立即返回None（由调用方重新翻译），而不是等待
+    claimed = []
+    waiter = threading.Thread(target=lambda: claimed.append(deduplicator.claim(deduplicator.key("Yeah."))), daemon=True)
+    waiter.start()
+    waiter.join(5)
+    assert claimed == [None], "其他线程仍在等待未释放的认领"
+
+
+def run_check(func, deadline):
+    """在后台线程中运行检查，返回 (是否通过, 耗时, 错误说明)"""
+    outcome = {}
+
+    def target():
+        try:
+            func()
+        except BaseException as e:
+            outcome['error'] = f"{type(e).__name__}: {e}"
+
+    started = time.perf_counter()
+    # 在主线程中重定向输出：卡死的检查不会一直占着 sys.stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(deadline)
+    elapsed = time.perf_counter() - started
+    if thread.is_alive():
+        return False, elapsed, f"超过 {deadline} 秒仍未结束"
+    return 'error' not in outcome, elapsed, outcome.get('error')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.regression", description="回归检查（使用本地模拟服务）")
+    parser.add_argument('--only', help="只运行名称包含该字符串的检查")
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE, help=f"每项检查的时限（秒，默认 {DEFAULT_DEADLINE}）")
+    args = parser.parse_args(argv)
+
+    failed = []
+    for func in CHECKS:
+        if args.only and args.only not in func.__name__:
+            continue
+        passed, elapsed, error = run_check(func, args.deadline)
+        status = "通过" if passed else "失败"
+        print(f"{func.__name__:<44} {elapsed:>7.2f}s  {status}{'：' + error if error else ''}")
+        if not passed:
+            failed.append(func.__name__)
+
+    if failed:
+        print(f"{len(failed)} 项检查失败：{', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    status = main()
+    sys.stdout.flush()
+    # 卡死的检查可能留下线程池的工作线程，解释器退出时会一直等待它们，因此直接结束进程
+    os._exit(status)
@@ -0,0 +1,217 @@
+"""
+端到端吞吐量基准
+
+启动本地模拟服务（benchmarks.mock_server），对不同规模的合成字幕运行
+SmartSubtitleTranslator.process_subtitle_file，报告：
+    - 每秒完成的字幕数（含内容分析，按整个文件的耗时计算）
+    - 单次API调用的客户端延迟 p50/p95/p99（含限流等待和连接池排队，不含重试前的退避）
+    - 平均每条字幕的输入/输出token数（由模拟服务按 usage 统计）
+
+示例：
+    python -m benchmarks.throughput --sizes 100,1000,10000 --workers 20 --latency lognormal:0.6:0.4
+    python -m benchmarks.throughput --sizes 1000 --batch --rate-429 0.05 --json bench.json
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+from benchmarks.corpus import write_srt
+from benchmarks.mock_server import MockLLMServer
+
+
+def percentile(values, fraction):
+    """最近秩法计算分位数，values 须已排序"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[rank]
+
+
+class LatencyRecorder:
+    """记录每次API调用的耗时，包装同步和异步翻译器的 translate 方法"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _record(self, started, failed):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.errors += failed
+
+    def wrap(self, translate):
+        def timed_translate(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = translate(*args, **kwargs)
+            except Exception:
+                self._record(started, True)
+                raise
+            self._record(started, False)
+            return result
+        return timed_translate
+
+    def wrap_async(self, translate):
+        async def timed_translate(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await translate(*args, **kwargs)
+            except Exception:
+                self._record(started, True)
+                raise
+            self._record(started, False)
+            return result
+        return timed_translate
+
+    @contextlib.contextmanager
+    def patch_async_translator(self):
+        """asyncio 引擎在内部创建 AsyncTranslator，只能在类上包装"""
+        from core.async_translator import AsyncTranslator
+        original = AsyncTranslator.translate
+        recorder = self
+
+        async def timed_translate(translator, *args, **kwargs):
+            return await recorder.wrap_async(original)(translator, *args, **kwargs)
+
+        AsyncTranslator.translate = timed_translate
+        try:
+            yield
+        finally:
+            AsyncTranslator.translate = original
+
+
+def run_once(server, size, args, workdir):
+    """翻译一个含 size 条字幕的合成文件，返回结果字典"""
+    from core.translator import Translator
+    from core.subtitle_translator import SmartSubtitleTranslator
+
+    source_path = write_srt(os.path.join(workdir, f"bench_{size}.srt"), size, seed=args.seed)
+    server.stats.reset()
+    recorder = LatencyRecorder()
+
+    translator = Translator({
+        'base_url': server.base_url,
+        'api_key': 'mock',
+        'model': 'mock-model',
+        'stream': args.stream,
+        'read_timeout': 600,
+    })
+    translator.translate = recorder.wrap(translator.translate)
+    subtitle_translator = SmartSubtitleTranslator(
+        translator,
+        max_workers=args.workers,
+        max_tokens=args.max_tokens,
+        batch_mode=args.batch,
+        engine=args.engine,
+        retry_delay_base=args.retry_delay_base,
+        output_dir=workdir,
+    )
+
+    output = io.StringIO()
+    redirect = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(output)
+    async_patch = recorder.patch_async_translator() if args.engine == 'async' else contextlib.nullcontext()
+    started = time.perf_counter()
+    with redirect, async_patch:
+        output_path, _ = subtitle_translator.process_subtitle_file(
+            source_path, args.target_lang, source_language=args.source_lang
+        )
+    elapsed = time.perf_counter() - started
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        failed = sum(1 for line in f if line.startswith(("[翻译失败]", "[翻译错误", "[处理失败]")))
+    translator.close()
+
+    stats = server.stats.snapshot()
+    latencies = sorted(recorder.latencies)
+    return {
+        'cues': size,
+        'seconds': elapsed,
+        'cues_per_second': size / elapsed if elapsed else 0.0,
+        'requests': stats['requests'],
+        'responses': stats['responses'],
+        'client_errors': recorder.errors,
+        'failed_cues': failed,
+        'passthrough_cues': subtitle_translator.passthrough_count,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'prompt_tokens_per_cue': stats['prompt_tokens'] / size,
+        'completion_tokens_per_cue': stats['completion_tokens'] / size,
+    }
+
+
+def format_table(results):
+    header = f"{'字幕数':>8} {'耗时(s)':>9} {'字幕/秒':>9} {'请求':>7} {'429':>5} {'500':>5} {'失败':>5} " \
+             f"{'p50(s)':>7} {'p95(s)':>7} {'p99(s)':>7} {'输入tok/条':>10} {'输出tok/条':>10}"
+    rows = [header]
+    for result in results:
+        responses = result['responses']
+        rows.append(
+            f"{result['cues']:>8} {result['seconds']:>9.2f} {result['cues_per_second']:>9.1f} "
+            f"{result['requests']:>7} {responses.get('429', 0):>5} {responses.get('500', 0):>5} "
+            f"{result['failed_cues']:>5} {result['p50']:>7.3f} {result['p95']:>7.3f} {result['p99']:>7.3f} "
+            f"{result['prompt_tokens_per_cue']:>10.1f} {result['completion_tokens_per_cue']:>10.1f}"
+        )
+    return "\n".join(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.throughput", description="端到端吞吐量基准（使用本地模拟服务）")
+    parser.add_argument('--sizes', default='100,1000,10000', help="合成字幕的条数，逗号分隔（如 100,1000,10000,100000）")
+    parser.add_argument('--seed', type=int, default=0, help="合成字幕与模拟服务的随机种子")
+    parser.add_argument('--workers', type=int, default=10, help="并发数")
+    parser.add_argument('--engine', choices=['thread', 'async'], default='thread')
+    parser.add_argument('--batch', action='store_true', help="批量模式")
+    parser.add_argument('--max-tokens', type=int, default=2000, help="批量模式下每批的token预算")
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help="不使用流式响应")
+    parser.add_argument('--retry-delay-base', type=float, default=0.5, help="重试退避的基础延迟（秒）")
+    parser.add_argument('--target-lang', default='Chinese')
+    parser.add_argument('--source-lang', default='English')
+    parser.add_argument('--json', dest='json_path', help="把结果另存为 JSON 文件")
+    parser.add_argument('--verbose', action='store_true', help="显示翻译过程中的输出")
+
+    server_group = parser.add_argument_group("模拟服务")
+    server_group.add_argument('--latency', default='lognormal:0.3:0.4', help="首token延迟分布，见 benchmarks.mock_server.LatencyModel")
+    server_group.add_argument('--token-latency', type=float, default=0.002, help="每个输出token的生成时间（秒）")
+    server_group.add_argument('--rate-429', type=float, default=0.0, help="随机返回 429 的比例")
+    server_group.add_argument('--rate-500', type=float, default=0.0, help="随机返回 500 的比例")
+    server_group.add_argument('--retry-after', type=float, default=0.5, help="429 响应的 Retry-After（秒）")
+    server_group.add_argument('--rpm', type=int, help="模拟服务的每分钟请求数上限")
+    server_group.add_argument('--chatter', type=int, default=0, help="译文后附加的多余解释字数")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    server = MockLLMServer(
+        latency=args.latency, token_latency=args.token_latency, rate_429=args.rate_429,
+        rate_500=args.rate_500, retry_after=args.retry_after, rpm=args.rpm,
+        chatter=args.chatter, seed=args.seed
+    )
+    results = []
+    with server, tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"翻译 {size} 条字幕...", file=sys.stderr)
+            results.append(run_once(server, size, args, workdir))
+
+    print(format_table(results))
+    if args.json_path:
+        settings = {key: value for key, value in vars(args).items() if key != 'json_path'}
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,7 +33,23 @@ class ConfigManager:
                 "source_lang": "English",
                 "target_lang": "Chinese",
                 "max_tokens": 4096,
-                "last_used_api": "OpenAI"  # 新增最后使用的API记录
+                "last_used_api": "OpenAI",  # 新增最后使用的API记录
+                "translation_memory_path": "translation_memory.db",  # 翻译记忆库文件
+                "translation_memory_max_entries": 200000,
+                "connect_timeout": 10,  # 连接超时（秒）
+                "read_timeout": 120,  # 读取超时（秒）
+                "stream_responses": True,  # 流式接收译文，收到所需行数后立即断开
+                "analysis_mode": "chunked",  # 内容分析方式：head（只分析开头）/ chunked（分段分析全文）
+                "analysis_chunk_tokens": 3000,  # 分段分析时每段的token预算
+                "analysis_cache_dir": "analysis_cache",  # 分析报告缓存目录，留空则不缓存
+                "deduplicate": True,  # 任务内相同的字幕只翻译一次（跨文件）
+                "dedup_exceptions": [],  # 含义依赖上下文、每次都需单独翻译的字幕文本
+                "passthrough": True,  # 纯符号、网址、已是目标语言的字幕在本地识别后原样保留，不请求API
+                "passthrough_sound_tags": True,  # 只含音效标签的字幕（如 [LAUGHTER]）也原样保留
+                "tokenizer": "auto",  # token计数方式：auto / tiktoken / approx
+                "tokenizer_file": "",  # 本地 cl100k_base.tiktoken 编码文件，离线环境使用
+                "metrics_format": "json",  # 每个文件的运行指标导出格式：json / prometheus / both / none
+                "model_prices": {}  # 模型单价（美元/百万token）：{"模型": [输入, 输出]}，覆盖内置单价
             }
         }
 
@@ -119,5 +135,19 @@ class ConfigManager:
     def get_last_used_api(self) -> str:
         return self.config['default_settings'].get('last_used_api', 'OpenAI')
 
-# 全局配置管理器
-config_manager = ConfigManager()
+# 全局配置管理器：首次访问 config.config_manager 时才读取 config.json
+_config_manager = None
+
+
+def get_config_manager():
+    global _config_manager
+    if _config_manager is None:
+        _config_manager = ConfigManager()
+    return _config_manager
+
+
+def __getattr__(name):
+    # 兼容 `from config import config_manager` 的写法，同时避免导入时读写配置文件
+    if name == 'config_manager':
+        return get_config_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
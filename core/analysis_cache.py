@@ -0,0 +1,58 @@
+import os
+import uuid
+import hashlib
+
+
+class AnalysisCache:
+    """
+    按内容寻址的分析报告缓存
+
+    键由字幕文本、专用词汇集合、分析模型和分析方式计算得出，与目标语言无关：
+    同一集翻译成多种语言、或崩溃后重新运行时只需分析一次。
+    每个报告保存为缓存目录下的一个文本文件，可直接查看或删除。
+    """
+
+    def __init__(self, directory='analysis_cache'):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(texts, custom_vocab, model, analysis_mode=''):
+        """
+        :param texts: 全部字幕文本（按顺序）
+        :param custom_vocab: 专用词汇，顺序和重复不影响结果
+        :param model: 分析使用的模型
+        :param analysis_mode: 分析方式及其参数，方式不同的报告互不复用
+        """
+        digest = hashlib.sha256()
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\x1e')
+        vocab = "\n".join(sorted(set(custom_vocab or [])))
+        for part in (vocab, model or '', analysis_mode or ''):
+            digest.update(b'\x1f')
+            digest.update(part.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        """读取缓存的报告，未命中返回None"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                report = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return report
+
+    def put(self, key, report):
+        """写入报告；先写临时文件再替换，并发写入同一个键也不会留下半个文件"""
+        temp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        os.replace(temp_path, self._path(key))
@@ -0,0 +1,136 @@
+import json
+import time
+import asyncio
+
+import aiohttp
+
+from core.rate_limiter import RateLimiter
+from core.tokenizer import approximate_tokens
+from core.metrics import metrics, provider_name
+from core.translator import build_payload, parse_sse_line, count_complete_lines, record_usage
+
+
+class AsyncTranslator:
+    """Translator 的 asyncio 版本，单线程内支持数百个并发请求"""
+
+    def __init__(self, config):
+        self.config = config
+        self.base_url = config.get('base_url')
+        self.api_key = config.get('api_key')
+        self.api_type = config.get('api_type', 'openai')
+        self.model = config.get('model', 'gpt-3.5-turbo')
+
+        # 连接池与超时设置（秒），与 Translator 使用相同的配置项
+        self.connect_timeout = config.get('connect_timeout', 10)
+        self.read_timeout = config.get('read_timeout', 120)
+        self.pool_size = config.get('pool_size', 100)
+        self._session = None
+        self.stream = config.get('stream', False)
+
+        # 与同一服务商的 Translator 共享限流额度
+        self.rate_limiter = RateLimiter.for_provider(
+            self.base_url,
+            config.get('requests_per_minute'),
+            config.get('tokens_per_minute')
+        )
+
+    def configure_pool(self, pool_size):
+        """按并发上限调整连接池大小，需在首次请求前调用"""
+        self.pool_size = pool_size
+
+    @property
+    def session(self):
+        """长连接会话，必须在事件循环内首次访问"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def translate(self, text, source_lang=None, target_lang=None, system_prompt=None, temperature=0.7,
+                        max_tokens=None, stop=None, max_lines=None):
+        """参数与 Translator.translate 相同"""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        # 如果文本为空，直接返回
+        if not text or text.strip() == '':
+            return ''
+
+        payload = build_payload(
+            self.model, text, system_prompt, temperature,
+            max_tokens=max_tokens, stop=stop, stream=self.stream
+        )
+
+        # 按字符数粗略预占token额度，避免在事件循环中调用分词器
+        estimated_tokens = 0
+        if self.rate_limiter.tokens_per_minute:
+            estimated_tokens = (len(system_prompt or '') + len(text)) // 2
+        await self.rate_limiter.acquire_async(estimated_tokens)
+
+        provider = provider_name(self.base_url)
+        outcome = 'error'
+        started = time.monotonic()
+        try:
+            async with self.session.post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=payload
+            ) as response:
+                self.rate_limiter.update_from_headers(response.headers)
+                if response.status == 429:
+                    outcome = 'rate_limited'
+                if self.stream and response.status < 400:
+                    translated_text, usage = await self._read_stream(response, max_lines)
+                else:
+                    # 出错时只输出状态和错误信息，不读取响应内容
+                    response.raise_for_status()
+                    result = json.loads(await response.text())
+                    usage = result.get('usage')
+                    translated_text = result['choices'][0]['message']['content'].strip()
+            outcome = 'success'
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Translation error: {e!r}")
+            raise
+        except json.JSONDecodeError as e:
+            print(f"JSON Decode error: {e}")
+            raise
+        finally:
+            metrics.record_request(provider, self.model, time.monotonic() - started, outcome)
+
+        self.rate_limiter.settle(estimated_tokens, (usage or {}).get('total_tokens'))
+        # 不在事件循环中加载分词器，缺少 usage 时按字符类别估算
+        record_usage(provider, self.model, usage, system_prompt, text, translated_text, count=approximate_tokens)
+        return translated_text
+
+    async def _read_stream(self, response, max_lines=None):
+        """读取SSE响应，收到 max_lines 行后断开，返回 (文本, 服务端报告的 usage)"""
+        parts = []
+        usage = None
+        async for raw_line in response.content:
+            line = raw_line.decode('utf-8').strip()
+            if not line:
+                continue
+            finished, content, chunk_usage = parse_sse_line(line)
+            if chunk_usage:
+                usage = chunk_usage
+            if finished:
+                break
+            parts.append(content)
+            if max_lines and '\n' in content and count_complete_lines(''.join(parts)) >= max_lines:
+                # 提前断开，不再接收剩余内容
+                response.close()
+                break
+        return ''.join(parts).strip(), usage
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import threading
+
+
+class CheckpointJournal:
+    """
+    逐条追加写入的翻译断点日志
+
+    每翻译完一条字幕追加一行JSON，写入经过缓冲，每隔一定条数或时间 flush + fsync 一次。
+    进程中途退出后，重新运行时可从日志恢复已完成的字幕，只翻译剩余部分。
+    第一行记录源文件内容的哈希，源文件变化后旧日志自动作废。
+    """
+
+    def __init__(self, path, source_hash, flush_every=50, fsync_interval=5.0):
+        """
+        :param source_hash: 源文件内容的 SHA-256 十六进制摘要（读取时由 srt_stream.hashed_lines 逐行计算）
+        """
+        self.path = path
+        self.source_hash = source_hash
+        self.flush_every = flush_every  # 每写入多少条 flush 一次
+        self.fsync_interval = fsync_interval  # 两次 fsync 的最长间隔（秒）
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def load(self):
+        """读取日志中已完成的字幕，返回 {位置: 译文}；日志不存在或与源文件不符时返回空"""
+        if not os.path.exists(self.path):
+            return {}
+        finished = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            header = f.readline()
+            try:
+                if json.loads(header).get('source') != self.source_hash:
+                    print("断点日志与当前源文件不一致，将重新翻译")
+                    return {}
+            except (json.JSONDecodeError, AttributeError):
+                return {}
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    finished[entry['position']] = entry['text']
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # 崩溃时最后一行可能只写了一半，直接忽略
+                    continue
+        return finished
+
+    def open(self, resume=True):
+        """
+        打开日志准备写入
+
+        :param resume: True 时在已有日志后追加；False 或日志无效时重新开始
+        """
+        finished = self.load() if resume else {}
+        if resume and os.path.exists(self.path) and self._header_matches():
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'source': self.source_hash}) + "\n")
+            self._sync()
+        return finished
+
+    def _header_matches(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            try:
+                return json.loads(f.readline()).get('source') == self.source_hash
+            except (json.JSONDecodeError, AttributeError):
+                return False
+
+    def record(self, position, text):
+        """追加一条已完成的字幕"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps({'position': position, 'text': text}, ensure_ascii=False) + "\n")
+            self._pending += 1
+            if self._pending >= self.flush_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """任务完成后删除日志"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,243 @@
+"""
+命令行批量翻译入口，适用于无图形界面的服务器和定时任务
+
+用法示例：
+    python -m core.cli "season1/*.srt" -t Chinese -w 20 -o out/
+    python -m core.cli ep01.srt --base-url https://api.openai.com/v1 --model gpt-4o
+
+不会导入 tkinter / customtkinter；只有在需要时才读取 config.json。
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m core.cli",
+        description="批量翻译SRT字幕文件（无图形界面）"
+    )
+    parser.add_argument('inputs', nargs='+', help="字幕文件路径或通配符，如 'season1/**/*.srt'")
+    parser.add_argument('-t', '--target-lang', help="目标语言，默认取配置中的 target_lang")
+    parser.add_argument('-s', '--source-lang', help="源语言，默认取配置中的 source_lang")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认与源文件相同")
+    parser.add_argument('-w', '--workers', type=int, default=5, help="并发数（默认5）")
+    parser.add_argument('--engine', choices=['thread', 'async'], default='thread', help="翻译引擎")
+    parser.add_argument('--batch', action='store_true', help="批量模式：多条字幕合并为一次请求")
+    parser.add_argument('--max-tokens', type=int, help="批量模式下每批的token预算")
+    parser.add_argument('--resume', action='store_true', help="从断点日志恢复")
+    parser.add_argument('--no-stream', action='store_true', help="不使用流式响应（服务端不支持SSE时使用）")
+    parser.add_argument('--no-dedup', action='store_true', help="不对相同的字幕去重，每条都单独翻译")
+    parser.add_argument('--no-passthrough', action='store_true',
+                        help="不在本地跳过纯符号、网址、已是目标语言等无需翻译的字幕")
+    parser.add_argument('--previous-source', help="增量翻译：生成现有译文时使用的原字幕（仅限单个输入文件）")
+    parser.add_argument('--vocab', help="专用词汇文件，每行一个")
+    parser.add_argument('--analysis', choices=['head', 'chunked'],
+                        help="内容分析方式：head 只分析开头，chunked 分段并发分析全文（默认取配置中的 analysis_mode）")
+    parser.add_argument('--tokenizer', choices=['auto', 'tiktoken', 'approx'],
+                        help="token计数方式，默认取配置中的 tokenizer（auto：只用本地编码文件，不联网）")
+    parser.add_argument('--tokenizer-file', help="本地 cl100k_base.tiktoken 编码文件")
+    parser.add_argument('--metrics-format', choices=['json', 'prometheus', 'both', 'none'],
+                        help="每个文件的运行指标导出格式，默认取配置中的 metrics_format")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="把整个任务的运行指标写入该文件（.prom 为 Prometheus 文本格式，否则为JSON）")
+
+    api_group = parser.add_argument_group("API设置")
+    api_group.add_argument('--config', default=None, help="配置文件路径（默认 config.json）")
+    api_group.add_argument('--api', help="使用配置文件中的API名称，默认为上次使用的API")
+    api_group.add_argument('--base-url', help="API基础URL，指定后不再从配置文件读取API")
+    api_group.add_argument('--model', help="模型名称")
+    api_group.add_argument('--api-key', help="API Key，也可通过环境变量 SRT_TRANSLATOR_API_KEY 设置")
+
+    cache_group = parser.add_argument_group("缓存设置")
+    cache_group.add_argument('--memory', help="翻译记忆库路径，默认取配置中的 translation_memory_path")
+    cache_group.add_argument('--no-memory', action='store_true', help="不使用翻译记忆库")
+    cache_group.add_argument('--analysis-cache', help="分析报告缓存目录，默认取配置中的 analysis_cache_dir")
+    cache_group.add_argument('--no-analysis-cache', action='store_true', help="不使用分析报告缓存")
+    return parser
+
+
+def expand_inputs(patterns):
+    """展开通配符，保持顺序并去重"""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def resolve_settings(args):
+    """
+    合并命令行参数与配置文件
+
+    只有命令行未提供完整的API信息或语言设置时才读取配置文件。
+    :return: (翻译器配置, 默认设置)
+    """
+    need_config = (not args.base_url or not args.target_lang or args.api
+                   or (not args.no_memory and not args.memory)
+                   or (not args.no_analysis_cache and not args.analysis_cache))
+    default_settings = {}
+    api_config = {}
+    if need_config:
+        from config import ConfigManager
+        manager = ConfigManager(args.config)
+        default_settings = manager.config.get('default_settings', {})
+        if not args.base_url:
+            api_name = args.api or manager.get_last_used_api()
+            api_config = next((api for api in manager.get_apis() if api['name'] == api_name), None)
+            if api_config is None:
+                raise ValueError(f"配置文件中未找到API: {api_name}")
+
+    models = api_config.get('models') or []
+    translator_config = {
+        'base_url': args.base_url or api_config.get('base_url'),
+        'api_key': args.api_key or os.environ.get('SRT_TRANSLATOR_API_KEY') or api_config.get('api_key', ''),
+        'api_type': api_config.get('api_type', 'openai'),
+        'model': args.model or (models[0] if models else 'gpt-3.5-turbo'),
+        'connect_timeout': default_settings.get('connect_timeout', 10),
+        'read_timeout': default_settings.get('read_timeout', 120),
+        'stream': not args.no_stream and default_settings.get('stream_responses', True),
+        'requests_per_minute': api_config.get('requests_per_minute'),
+        'tokens_per_minute': api_config.get('tokens_per_minute')
+    }
+    return translator_config, default_settings
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    file_paths = expand_inputs(args.inputs)
+    if not file_paths:
+        print("没有找到匹配的字幕文件", file=sys.stderr)
+        return 2
+    if args.previous_source and len(file_paths) != 1:
+        print("--previous-source 只能用于单个输入文件", file=sys.stderr)
+        return 2
+
+    try:
+        translator_config, default_settings = resolve_settings(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not translator_config['api_key']:
+        print("未提供API Key（--api-key 或环境变量 SRT_TRANSLATOR_API_KEY）", file=sys.stderr)
+        return 2
+
+    target_lang = args.target_lang or default_settings.get('target_lang', 'Chinese')
+    source_lang = args.source_lang or default_settings.get('source_lang')
+
+    custom_vocab = []
+    if args.vocab:
+        with open(args.vocab, 'r', encoding='utf-8') as f:
+            custom_vocab = [line.strip() for line in f if line.strip()]
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # 参数解析完成后才导入翻译模块，保证 --help 等操作足够快
+    from core import tokenizer
+    tokenizer.configure(
+        args.tokenizer or default_settings.get('tokenizer', 'auto'),
+        args.tokenizer_file or default_settings.get('tokenizer_file')
+    )
+    from core.metrics import metrics
+    metrics.configure(default_settings.get('model_prices'))
+    from core.translator import Translator
+    from core.subtitle_translator import SmartSubtitleTranslator
+    from core.pipeline import MultiFilePipeline
+
+    translation_memory = None
+    if not args.no_memory:
+        from core.translation_memory import TranslationMemory
+        translation_memory = TranslationMemory(
+            args.memory or default_settings.get('translation_memory_path', 'translation_memory.db'),
+            max_entries=default_settings.get('translation_memory_max_entries', 200000)
+        )
+
+    analysis_cache = None
+    analysis_cache_dir = args.analysis_cache or default_settings.get('analysis_cache_dir')
+    if analysis_cache_dir and not args.no_analysis_cache:
+        from core.analysis_cache import AnalysisCache
+        analysis_cache = AnalysisCache(analysis_cache_dir)
+
+    deduplicator = None
+    if default_settings.get('deduplicate', True) and not args.no_dedup:
+        from core.dedup import CueDeduplicator
+        deduplicator = CueDeduplicator(default_settings.get('dedup_exceptions'))
+
+    translator = Translator(translator_config)
+    translator_options = {
+        'max_tokens': args.max_tokens or default_settings.get('max_tokens', 2000),
+        'custom_vocab': custom_vocab,
+        'batch_mode': args.batch,
+        'translation_memory': translation_memory,
+        'engine': args.engine,
+        'output_dir': args.output_dir,
+        'analysis_mode': args.analysis or default_settings.get('analysis_mode', 'head'),
+        'analysis_chunk_tokens': default_settings.get('analysis_chunk_tokens', 3000),
+        'analysis_cache': analysis_cache,
+        'deduplicator': deduplicator,
+        'passthrough': default_settings.get('passthrough', True) and not args.no_passthrough,
+        'passthrough_sound_tags': default_settings.get('passthrough_sound_tags', True),
+        'metrics_format': args.metrics_format or default_settings.get('metrics_format', 'json')
+    }
+
+    failed_files = []
+    try:
+        if len(file_paths) == 1:
+            # 单个文件直接处理，可以使用 asyncio 引擎
+            subtitle_translator = SmartSubtitleTranslator(
+                translator=translator, max_workers=args.workers, **translator_options
+            )
+            try:
+                if args.previous_source:
+                    output_path, _ = subtitle_translator.process_incremental(
+                        file_paths[0], args.previous_source, target_lang, source_language=source_lang
+                    )
+                else:
+                    output_path, _ = subtitle_translator.process_subtitle_file(
+                        file_paths[0], target_lang, source_language=source_lang, resume=args.resume
+                    )
+                print(f"已保存: {output_path}")
+            except Exception as e:
+                print(f"处理 {file_paths[0]} 时出错: {e}", file=sys.stderr)
+                failed_files.append(file_paths[0])
+        else:
+            # 多个文件共用并发预算，分析与翻译交错进行
+            pipeline = MultiFilePipeline(translator, max_workers=args.workers, **translator_options)
+            jobs = pipeline.run(
+                file_paths, target_lang, source_language=source_lang, resume=args.resume,
+                progress_callback=lambda done, total, path: print(f"[{done}/{total}] 已完成 {path}")
+            )
+            for job in jobs:
+                if job.error is not None:
+                    print(f"处理 {job.file_path} 时出错: {job.error}", file=sys.stderr)
+                    failed_files.append(job.file_path)
+    finally:
+        translator.close()
+        if translation_memory is not None:
+            translation_memory.close()
+
+    print(f"本次任务{metrics.summary()}")
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            if args.metrics.endswith('.prom'):
+                f.write(metrics.to_prometheus())
+            else:
+                json.dump(metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        print(f"运行指标已保存: {args.metrics}")
+
+    if failed_files:
+        print(f"{len(failed_files)} 个文件处理失败", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
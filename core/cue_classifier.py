@@ -0,0 +1,171 @@
+import re
+
+
+# 字幕中的格式标签：<i>...</i>、{\an8} 等，不计入文字内容
+FORMAT_TAG_PATTERN = re.compile(r'<[^>\n]*>|\{\\[^}\n]*\}')
+# 网址、邮箱和域名
+URL_PATTERN = re.compile(
+    r'(?:https?://|www\.)\S+'
+    r'|[\w.+-]+@[\w-]+(?:\.[\w-]+)+'
+    r'|\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org|io|tv|gg|co|me|cn|jp|uk|de)\b(?:/\S*)?',
+    re.IGNORECASE
+)
+# 音效/说明标签：[LAUGHTER]、(gunshot)、（笑声）
+SOUND_TAG_PATTERN = re.compile(r'\[[^\]\n]*\]|\([^)\n]*\)|（[^）\n]*）|【[^】\n]*】')
+
+# 各文字的码位区间，按常见程度排列
+_SCRIPT_RANGES = (
+    ('latin', ((0x0041, 0x024F), (0x1E00, 0x1EFF))),
+    ('han', ((0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0xF900, 0xFAFF), (0x20000, 0x2FA1F))),
+    ('kana', ((0x3040, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F))),
+    ('hangul', ((0xAC00, 0xD7AF), (0x1100, 0x11FF), (0x3130, 0x318F))),
+    ('cyrillic', ((0x0400, 0x052F),)),
+    ('greek', ((0x0370, 0x03FF),)),
+    ('arabic', ((0x0600, 0x06FF), (0x0750, 0x077F))),
+    ('hebrew', ((0x0590, 0x05FF),)),
+    ('thai', ((0x0E00, 0x0E7F),)),
+    ('devanagari', ((0x0900, 0x097F),)),
+)
+
+# 语言名称（英文或中文，不区分大小写）中的关键字 -> 该语言使用的文字
+_LANGUAGE_SCRIPTS = (
+    (('chinese', 'mandarin', 'cantonese', '中文', '汉语', '漢語', '简体', '繁体', '繁體', 'zh'), 'han'),
+    (('japanese', '日语', '日文', '日本語', 'ja'), 'kana'),
+    (('korean', '韩语', '韩文', '한국어', 'ko'), 'hangul'),
+    (('russian', 'ukrainian', 'bulgarian', 'serbian', '俄语', '乌克兰语', 'ru', 'uk'), 'cyrillic'),
+    (('greek', '希腊语', 'el'), 'greek'),
+    (('arabic', 'persian', 'farsi', 'urdu', '阿拉伯语', '波斯语', 'ar', 'fa'), 'arabic'),
+    (('hebrew', '希伯来语', 'he'), 'hebrew'),
+    (('thai', '泰语', 'th'), 'thai'),
+    (('hindi', 'marathi', 'nepali', '印地语', 'hi'), 'devanagari'),
+    (('english', 'french', 'german', 'spanish', 'italian', 'portuguese', 'dutch', 'polish',
+      'turkish', 'vietnamese', 'indonesian', 'swedish', 'norwegian', 'danish', 'finnish', 'czech',
+      '英语', '英文', '法语', '德语', '西班牙语', '意大利语', '葡萄牙语', '越南语',
+      'en', 'fr', 'de', 'es', 'it', 'pt', 'nl', 'pl', 'tr', 'vi', 'id'), 'latin'),
+)
+
+# 判定为目标语言时，目标文字在全部文字单位中所占的最低比例（允许夹杂少量人名、缩写）
+TARGET_SCRIPT_RATIO = 0.8
+# 逐字计数的文字；其他文字按单词计数，使 "NBA总决赛" 中的 "NBA" 只算一个单位
+_PER_CHAR_SCRIPTS = frozenset(('han', 'kana', 'hangul'))
+
+# 跳过原因及报告中使用的说明
+REASON_LABELS = {
+    'symbols': '纯符号/数字',
+    'url': '网址',
+    'sound_tag': '音效标签',
+    'target_language': '已是目标语言',
+}
+
+
+def script_of(char):
+    """返回字母所属的文字，未收录的文字返回 'other'"""
+    code = ord(char)
+    for script, ranges in _SCRIPT_RANGES:
+        for low, high in ranges:
+            if low <= code <= high:
+                return script
+    return 'other'
+
+
+def language_script(language):
+    """根据语言名称推断其使用的文字，无法判断时返回None"""
+    if not language:
+        return None
+    name = language.strip().casefold()
+    words = set(re.split(r'[\s_()\-]+', name))
+    for keywords, script in _LANGUAGE_SCRIPTS:
+        for keyword in keywords:
+            # 两个字母的语言代码只做整词匹配，避免 "en" 匹配 "Korean"
+            if (keyword in words) if keyword.isascii() and len(keyword) <= 2 else (keyword in name):
+                return script
+    return None
+
+
+def _has_letters(text):
+    return any(char.isalpha() for char in text)
+
+
+class CueClassifier:
+    """
+    本地字幕预分类器
+
+    在请求API之前，用字符类别和文字（Unicode script）判断字幕是否需要翻译，
+    纯符号、数字、网址、音效标签以及已是目标语言的字幕原样保留。只做保守判断：
+    无法确定时一律交给模型翻译。
+    """
+
+    def __init__(self, target_language=None, source_language=None, sound_tags=True):
+        """
+        :param target_language: 目标语言名称，用于识别已是目标语言的字幕
+        :param source_language: 源语言名称；目标语言与源语言使用相同文字（如英译法）时不做语言判断
+        :param sound_tags: 是否保留只含音效标签的字幕（如 "[LAUGHTER]"）
+        """
+        self.target_script = language_script(target_language)
+        self.source_script = language_script(source_language)
+        self.sound_tags = sound_tags
+        if self.target_script == 'latin' and self.source_script in (None, 'latin'):
+            # 同为拉丁字母的语言无法按文字区分
+            self.target_script = None
+
+    def classify(self, text):
+        """返回无需翻译的原因（REASON_LABELS 的键），需要翻译时返回None"""
+        content = FORMAT_TAG_PATTERN.sub('', text)
+        if not _has_letters(content):
+            return 'symbols'
+        without_urls = URL_PATTERN.sub('', content)
+        if not _has_letters(without_urls):
+            return 'url'
+        if self.sound_tags:
+            without_tags = SOUND_TAG_PATTERN.sub('', without_urls)
+            if without_tags != without_urls and not _has_letters(without_tags):
+                return 'sound_tag'
+        if self.target_script and self.is_target_language(without_urls):
+            return 'target_language'
+        return None
+
+    def is_target_language(self, text):
+        """文字以目标文字为主时视为已是目标语言"""
+        counts = {}
+        previous = None
+        for char in text:
+            if not char.isalpha():
+                previous = None
+                continue
+            script = script_of(char)
+            if script != previous or script in _PER_CHAR_SCRIPTS:
+                counts[script] = counts.get(script, 0) + 1
+            previous = script
+        total = sum(counts.values())
+        if self.target_script == 'kana':
+            # 日文由假名和汉字组成，必须出现假名才能与中文区分
+            if not counts.get('kana'):
+                return False
+            target = counts['kana'] + counts.get('han', 0)
+        elif self.target_script == 'han':
+            # 出现假名或谚文时是日文或韩文
+            if counts.get('kana') or counts.get('hangul'):
+                return False
+            target = counts.get('han', 0)
+        elif self.target_script == 'hangul':
+            target = counts.get('hangul', 0) + counts.get('han', 0)
+        else:
+            target = counts.get(self.target_script, 0)
+        return target > 0 and target >= total * TARGET_SCRIPT_RATIO
+
+    def classify_all(self, subtitles, skip=None):
+        """
+        对一组字幕分类
+
+        :param skip: 不参与分类的位置（如已有译文）
+        :return: {位置: 原因}
+        """
+        skip = skip or ()
+        reasons = {}
+        for position, subtitle in enumerate(subtitles):
+            if position in skip:
+                continue
+            reason = self.classify(subtitle.text)
+            if reason is not None:
+                reasons[position] = reason
+        return reasons
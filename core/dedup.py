@@ -0,0 +1,71 @@
+import re
+import threading
+
+
+class CueDeduplicator:
+    """
+    任务内的字幕去重
+
+    "Yeah."、"What?"、"[LAUGHTER]" 这类字幕在一季中反复出现，归一化空白后完全相同的字幕
+    只翻译一次，译文分发给所有相同的字幕。同一个实例可由多个文件的翻译器共用，实现跨文件去重。
+    例外列表中的文本含义依赖上下文（如 "Right."），每次出现都单独翻译。
+    """
+
+    def __init__(self, exceptions=None):
+        """
+        :param exceptions: 不参与去重的文本列表，比较时忽略大小写和多余空白
+        """
+        self.exceptions = {self.normalize(text).casefold() for text in exceptions or []}
+        self.reused = 0  # 复用其他文件已完成译文的次数
+        self._done = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text):
+        """归一化：合并连续空白并去除首尾空白"""
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def key(self, text):
+        """去重键；空文本和例外列表中的文本返回None"""
+        key = self.normalize(text)
+        if not key or key.casefold() in self.exceptions:
+            return None
+        return key
+
+    def get(self, key):
+        """返回已完成的译文，没有时返回None"""
+        with self._lock:
+            text = self._done.get(key)
+            if text is not None:
+                self.reused += 1
+            return text
+
+    def claim(self, key):
+        """
+        准备翻译一条字幕
+
+        已有译文时直接返回；其他线程正在翻译相同文本时等待其完成后返回其译文；
+        否则返回None，由调用方翻译，并且之后必须调用 resolve()。
+        """
+        while True:
+            with self._lock:
+                text = self._done.get(key)
+                if text is not None:
+                    self.reused += 1
+                    return text
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    return None
+            # 正在翻译的请求失败时会唤醒等待者，由其中一个重新翻译
+            event.wait()
+
+    def resolve(self, key, text):
+        """记录翻译结果（失败时为None），并唤醒等待相同文本的线程"""
+        with self._lock:
+            if text is not None:
+                self._done[key] = text
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
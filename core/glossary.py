@@ -0,0 +1,90 @@
+import re
+from collections import deque
+
+
+# 词汇条目中原文与译文的分隔符，如 "Mordenkainen：魔邓肯"、"Fireball = 火球术"
+ENTRY_SEPARATOR_PATTERN = re.compile(r'\s*(?:->|=>|=|：|:|\t)\s*')
+
+
+def source_term(entry):
+    """取词汇条目的原文部分；没有分隔符时整行都是原文"""
+    return ENTRY_SEPARATOR_PATTERN.split(entry.strip(), 1)[0]
+
+
+def _is_word_char(char):
+    # 拉丁等字母文字需要按单词边界匹配，中日韩文字没有单词边界
+    return char.isalnum() and ord(char) < 0x2E80
+
+
+class GlossaryMatcher:
+    """
+    专用词汇的多模式匹配器（Aho-Corasick 自动机）
+
+    对所有词条的原文建立一次自动机，之后对每段文本只需扫描一遍，
+    就能找出其中出现的全部词条，耗时与词汇表大小无关。匹配不区分大小写，
+    拉丁文字的词条只在单词边界处匹配（"Ray" 不会匹配 "rays"）。
+    """
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for entry_index, entry in enumerate(self.entries):
+            term = source_term(entry).casefold()
+            if not term:
+                continue
+            node = 0
+            for char in term:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((entry_index, len(term)))
+
+        # 按层次遍历建立失配指针，并把后缀节点的输出合并进来
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+
+    def find(self, text):
+        """返回文本中出现的词条序号集合"""
+        found = set()
+        if not text:
+            return found
+        text = text.casefold()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for entry_index, length in output[node]:
+                if entry_index in found:
+                    continue
+                start = position - length + 1
+                if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(char) and position + 1 < len(text) and _is_word_char(text[position + 1]):
+                    continue
+                found.add(entry_index)
+        return found
+
+    def relevant_entries(self, *texts):
+        """返回在任一文本中出现的词条，保持词汇表中的原有顺序"""
+        found = set()
+        for text in texts:
+            found |= self.find(text)
+        return [self.entries[entry_index] for entry_index in sorted(found)]
@@ -0,0 +1,49 @@
+import re
+import difflib
+from collections import defaultdict
+
+from core.srt_stream import timestamp_to_ms
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def align_subtitles(old_subtitles, new_subtitles):
+    """
+    将修改后的字幕与原字幕对齐
+
+    先按文本做序列比对，顺序一致且文本相同的字幕直接对应（时间轴调整不影响对应关系）；
+    剩余的字幕再按相同文本中时间最接近的一条匹配，处理被移动位置的字幕。
+
+    :param old_subtitles: 生成现有译文时使用的原字幕
+    :param new_subtitles: 修改后的字幕
+    :return: {新位置: 旧位置}，未出现的新位置为修改或新增的字幕
+    """
+    old_texts = [_normalize(s.text) for s in old_subtitles]
+    new_texts = [_normalize(s.text) for s in new_subtitles]
+
+    mapping = {}
+    matcher = difflib.SequenceMatcher(None, old_texts, new_texts, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(new_end - new_start):
+                mapping[new_start + offset] = old_start + offset
+
+    # 未对齐的旧字幕按文本分组，供移动过位置的字幕匹配
+    matched_old = set(mapping.values())
+    unmatched_old = defaultdict(list)
+    for position, text in enumerate(old_texts):
+        if position not in matched_old:
+            unmatched_old[text].append(position)
+
+    for position, text in enumerate(new_texts):
+        if position in mapping or not unmatched_old.get(text):
+            continue
+        start = timestamp_to_ms(new_subtitles[position].timestamp_in)
+        candidates = unmatched_old[text]
+        best = min(candidates, key=lambda p: abs(timestamp_to_ms(old_subtitles[p].timestamp_in) - start))
+        candidates.remove(best)
+        mapping[position] = best
+
+    return mapping
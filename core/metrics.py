@@ -0,0 +1,312 @@
+"""
+运行时指标
+
+进程内共享一个 MetricsRegistry（metrics），记录：
+    - 每个服务商/模型的请求耗时直方图和请求结果（成功、限流、错误）
+    - 输入/输出token数，优先使用响应中的 usage 字段，缺失时（如流式响应提前断开）按本地计数估算
+    - 重试、失败、翻译记忆命中、分析报告缓存命中、去重复用、本地跳过等事件
+    - 按模型单价估算的费用
+
+指标同时计入整个任务和当前文件（由 scope() 指定），可导出为 JSON 或 Prometheus 文本格式，
+每个文件的指标与 _analysis.txt 报告保存在一起。
+"""
+import os
+import json
+import threading
+import contextlib
+import contextvars
+from urllib.parse import urlparse
+
+
+# 请求耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+# 模型单价（美元/百万token：输入, 输出），仅用于估算，可通过 configure(prices=...) 或配置项 model_prices 覆盖
+DEFAULT_MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4': (30.0, 60.0),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+
+# 事件计数器的名称及说明
+EVENTS = {
+    'retries': '重试次数',
+    'failures': '重试用尽后仍失败的字幕数',
+    'memory_hits': '翻译记忆命中的字幕数',
+    'analysis_cache_hits': '分析报告缓存命中次数',
+    'dedup_reused': '复用其他文件译文的字幕数',
+    'dedup_followers': '随相同字幕一起翻译的重复字幕数',
+    'passthrough': '本地判定无需翻译的字幕数',
+}
+
+METRICS_FORMATS = ('json', 'prometheus', 'both', 'none')
+
+_current_scope = contextvars.ContextVar('metrics_scope', default=None)
+
+
+def provider_name(base_url):
+    """服务商标签：API地址的主机名"""
+    return urlparse(base_url or '').hostname or 'unknown'
+
+
+class Histogram:
+    """固定桶的直方图，记录各桶（非累计）计数、总和与次数"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for number, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[number] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(桶上限, 累计计数)]，最后一项的上限为 '+Inf'"""
+        result = []
+        total = 0
+        for upper, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((upper, total))
+        return result
+
+
+class _MetricsSet:
+    """一个范围（整个任务或单个文件）内的指标"""
+
+    def __init__(self):
+        self.requests = {}  # {(服务商, 模型, 结果): 次数}
+        self.latency = {}  # {(服务商, 模型): Histogram}
+        self.tokens = {}  # {(服务商, 模型): [输入token, 输出token]}
+        self.estimated_requests = 0  # 无 usage、按本地计数估算token的请求数
+        self.events = dict.fromkeys(EVENTS, 0)
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prices = dict(DEFAULT_MODEL_PRICES)
+        self.reset()
+
+    def configure(self, prices=None):
+        """
+        :param prices: {模型: [输入单价, 输出单价]}（美元/百万token），与默认单价合并
+        """
+        with self._lock:
+            self.prices = dict(DEFAULT_MODEL_PRICES)
+            for model, price in (prices or {}).items():
+                self.prices[model] = (float(price[0]), float(price[1]))
+
+    def reset(self):
+        """清空所有指标（开始新任务时调用）"""
+        with self._lock:
+            self._job = _MetricsSet()
+            self._files = {}
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        """在当前线程（或 asyncio 任务）中把之后记录的指标同时计入指定文件"""
+        token = _current_scope.set(name)
+        try:
+            yield
+        finally:
+            _current_scope.reset(token)
+
+    def _targets(self, scope):
+        targets = [self._job]
+        if scope is not None:
+            file_set = self._files.get(scope)
+            if file_set is None:
+                file_set = self._files[scope] = _MetricsSet()
+            targets.append(file_set)
+        return targets
+
+    def record_request(self, provider, model, seconds, outcome='success'):
+        """
+        记录一次API请求
+
+        :param outcome: 'success'、'rate_limited'（429）或 'error'
+        """
+        with self._lock:
+            for target in self._targets(_current_scope.get()):
+                key = (provider, model, outcome)
+                target.requests[key] = target.requests.get(key, 0) + 1
+                histogram = target.latency.get((provider, model))
+                if histogram is None:
+                    histogram = target.latency[(provider, model)] = Histogram()
+                histogram.observe(seconds)
+
+    def record_usage(self, provider, model, prompt_tokens, completion_tokens, estimated=False):
+        """记录一次请求的token用量；estimated 表示服务端未返回 usage、由本地计数得出"""
+        with self._lock:
+            for target in self._targets(_current_scope.get()):
+                tokens = target.tokens.setdefault((provider, model), [0, 0])
+                tokens[0] += prompt_tokens or 0
+                tokens[1] += completion_tokens or 0
+                target.estimated_requests += estimated
+
+    def increment(self, event, amount=1, scope=None):
+        """
+        事件计数
+
+        :param scope: 计入的文件，默认为当前范围
+        """
+        if not amount:
+            return
+        with self._lock:
+            for target in self._targets(scope if scope is not None else _current_scope.get()):
+                target.events[event] = target.events.get(event, 0) + amount
+
+    def price(self, model):
+        """模型单价：精确匹配，否则取最长的前缀匹配（如 gpt-4o-2024-08-06 按 gpt-4o 计价），未知时返回None"""
+        if model in self.prices:
+            return self.prices[model]
+        matches = [name for name in self.prices if model and model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def _cost(self, metrics_set):
+        """返回 (估算费用, 没有单价的模型列表)"""
+        cost = 0.0
+        unpriced = set()
+        for (_, model), (prompt_tokens, completion_tokens) in metrics_set.tokens.items():
+            price = self.price(model)
+            if price is None:
+                unpriced.add(model)
+                continue
+            cost += (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+        return cost, sorted(unpriced)
+
+    def _get_set(self, scope):
+        return self._job if scope is None else self._files.get(scope, _MetricsSet())
+
+    def snapshot(self, scope=None):
+        """
+        指标快照（可直接序列化为JSON）
+
+        :param scope: 文件范围，None 表示整个任务
+        """
+        with self._lock:
+            metrics_set = self._get_set(scope)
+            cost, unpriced = self._cost(metrics_set)
+            providers = []
+            for (provider, model), histogram in sorted(metrics_set.latency.items()):
+                prompt_tokens, completion_tokens = metrics_set.tokens.get((provider, model), (0, 0))
+                providers.append({
+                    'provider': provider,
+                    'model': model,
+                    'requests': {
+                        outcome: count for (p, m, outcome), count in sorted(metrics_set.requests.items())
+                        if (p, m) == (provider, model)
+                    },
+                    'latency_seconds': {
+                        'count': histogram.count,
+                        'sum': round(histogram.sum, 6),
+                        'buckets': {str(upper): count for upper, count in histogram.cumulative()},
+                    },
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                })
+            return {
+                'scope': scope or 'job',
+                'providers': providers,
+                'prompt_tokens': sum(tokens[0] for tokens in metrics_set.tokens.values()),
+                'completion_tokens': sum(tokens[1] for tokens in metrics_set.tokens.values()),
+                'estimated_token_requests': metrics_set.estimated_requests,
+                'events': dict(metrics_set.events),
+                'estimated_cost_usd': round(cost, 6),
+                'unpriced_models': unpriced,
+            }
+
+    def to_prometheus(self, scope=None):
+        """
+        Prometheus 文本格式（可供 node_exporter 的 textfile collector 读取）
+
+        文件范围的指标带 file 标签，多个文件的导出可以放在同一目录下。
+        """
+        snapshot = self.snapshot(scope)
+        base_labels = {'file': os.path.basename(scope)} if scope else {}
+        lines = []
+
+        def add(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels({**base_labels, **labels})} {value}")
+
+        latency_samples, request_samples, token_samples = [], [], []
+        for entry in snapshot['providers']:
+            labels = {'provider': entry['provider'], 'model': entry['model']}
+            latency = entry['latency_seconds']
+            for upper, count in latency['buckets'].items():
+                latency_samples.append(('_bucket', {**labels, 'le': upper}, count))
+            latency_samples.append(('_sum', labels, latency['sum']))
+            latency_samples.append(('_count', labels, latency['count']))
+            for outcome, count in entry['requests'].items():
+                request_samples.append(('', {**labels, 'outcome': outcome}, count))
+            token_samples.append(('', {**labels, 'type': 'prompt'}, entry['prompt_tokens']))
+            token_samples.append(('', {**labels, 'type': 'completion'}, entry['completion_tokens']))
+
+        add('srt_translator_request_duration_seconds', 'histogram', 'API request latency in seconds', latency_samples)
+        add('srt_translator_requests_total', 'counter', 'API requests by outcome', request_samples)
+        add('srt_translator_tokens_total', 'counter', 'Tokens from the API usage field, estimated locally when missing', token_samples)
+        add('srt_translator_events_total', 'counter', 'Retries, failures and cache hits',
+            [('', {'event': event}, count) for event, count in snapshot['events'].items()])
+        add('srt_translator_estimated_cost_usd', 'gauge', 'Estimated cost in US dollars',
+            [('', {}, snapshot['estimated_cost_usd'])])
+        return "\n".join(lines) + "\n"
+
+    def write(self, base_path, scope=None, metrics_format='json'):
+        """
+        导出指标，返回写入的文件路径列表
+
+        :param base_path: 不含扩展名的路径，生成 base_path.json 和/或 base_path.prom
+        :param metrics_format: 'json'、'prometheus'、'both' 或 'none'
+        """
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"未知的指标格式: {metrics_format}，可选 {', '.join(METRICS_FORMATS)}")
+        paths = []
+        if metrics_format in ('json', 'both'):
+            paths.append(f"{base_path}.json")
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(scope), f, ensure_ascii=False, indent=2)
+        if metrics_format in ('prometheus', 'both'):
+            paths.append(f"{base_path}.prom")
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus(scope))
+        return paths
+
+    def summary(self, scope=None):
+        """一行文字摘要，用于在任务结束时打印"""
+        snapshot = self.snapshot(scope)
+        requests = sum(sum(entry['requests'].values()) for entry in snapshot['providers'])
+        cost = f"约 ${snapshot['estimated_cost_usd']:.4f}"
+        if snapshot['unpriced_models']:
+            cost += f"（未计入无单价的模型 {', '.join(snapshot['unpriced_models'])}）"
+        return (f"API请求 {requests} 次，输入 {snapshot['prompt_tokens']} token，"
+                f"输出 {snapshot['completion_tokens']} token，费用{cost}，"
+                f"重试 {snapshot['events']['retries']} 次")
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+# 进程内共享的注册表
+metrics = MetricsRegistry()
@@ -8,7 +8,12 @@ import customtkinter as ctk
 
 from config import config_manager
 from core.translator import Translator
-from core.subtitle_translator import SmartSubtitleTranslator
+from core.pipeline import MultiFilePipeline
+from core.translation_memory import TranslationMemory
+from core.analysis_cache import AnalysisCache
+from core.dedup import CueDeduplicator
+from core import tokenizer
+from core.metrics import metrics
 
 class TranslatorPage(ctk.CTkFrame):
     def __init__(self, master):
@@ -134,6 +139,14 @@ class TranslatorPage(ctk.CTkFrame):
         self.temperature.pack(side="left", padx=5)
         self.temperature.insert(0, "0.7")
 
+        # 批量模式：多条字幕合并为一次请求
+        self.batch_mode = ctk.CTkCheckBox(settings_frame, text="批量模式")
+        self.batch_mode.pack(side="left", padx=5)
+
+        # 断点续传：从上次中断处继续翻译
+        self.resume_mode = ctk.CTkCheckBox(settings_frame, text="断点续传")
+        self.resume_mode.pack(side="left", padx=5)
+
         # 专用词汇按钮
         add_vocab_button = ctk.CTkButton(
             settings_frame, 
@@ -334,13 +347,30 @@ class TranslatorPage(ctk.CTkFrame):
                 raise ValueError("未找到选定的API配置")
 
             # 准备翻译配置
+            default_settings = config_manager.config['default_settings']
             translator_config = {
                 'base_url': api_config['base_url'],
                 'api_key': self.api_key_entry.get(),
                 'api_type': api_config['api_type'],
-                'model': self.model_select.get()
+                'model': self.model_select.get(),
+                'connect_timeout': default_settings.get('connect_timeout', 10),
+                'read_timeout': default_settings.get('read_timeout', 120),
+                'stream': default_settings.get('stream_responses', True),
+                # 可选：在API配置中设置每分钟请求数/token数上限
+                'requests_per_minute': api_config.get('requests_per_minute'),
+                'tokens_per_minute': api_config.get('tokens_per_minute')
             }
 
+            # 选择token计数方式，离线环境不会因下载编码文件而卡住
+            tokenizer.configure(
+                default_settings.get('tokenizer', 'auto'),
+                default_settings.get('tokenizer_file')
+            )
+
+            # 新任务重新统计运行指标，单价可在配置中覆盖
+            metrics.configure(default_settings.get('model_prices'))
+            metrics.reset()
+
             # 创建翻译器
             translator = Translator(translator_config)
             
@@ -352,41 +382,69 @@ class TranslatorPage(ctk.CTkFrame):
                 messagebox.showwarning("警告", "并发数和温度必须是数字")
                 return
 
-            # 创建字幕翻译器
-            subtitle_translator = SmartSubtitleTranslator(
+            # 打开翻译记忆库，重复出现的字幕不会再次请求API
+            translation_memory = TranslationMemory(
+                default_settings.get('translation_memory_path', 'translation_memory.db'),
+                max_entries=default_settings.get('translation_memory_max_entries', 200000)
+            )
+
+            # 分析报告缓存：同一文件翻译成多种语言时只分析一次
+            analysis_cache_dir = default_settings.get('analysis_cache_dir')
+            analysis_cache = AnalysisCache(analysis_cache_dir) if analysis_cache_dir else None
+
+            # 所有文件共用一个去重器，整季中相同的字幕只翻译一次
+            deduplicator = None
+            if default_settings.get('deduplicate', True):
+                deduplicator = CueDeduplicator(default_settings.get('dedup_exceptions'))
+
+            # 多文件流水线：所有文件共用并发预算，分析与翻译交错进行
+            pipeline = MultiFilePipeline(
                 translator=translator, 
                 max_workers=max_workers,
-                custom_vocab=self.custom_vocab  # 传入自定义词汇
+                max_tokens=default_settings.get('max_tokens', 2000),
+                custom_vocab=self.custom_vocab,  # 传入自定义词汇
+                batch_mode=bool(self.batch_mode.get()),
+                translation_memory=translation_memory,
+                analysis_mode=default_settings.get('analysis_mode', 'head'),
+                analysis_chunk_tokens=default_settings.get('analysis_chunk_tokens', 3000),
+                analysis_cache=analysis_cache,
+                deduplicator=deduplicator,
+                passthrough=default_settings.get('passthrough', True),
+                passthrough_sound_tags=default_settings.get('passthrough_sound_tags', True),
+                metrics_format=default_settings.get('metrics_format', 'json')
             )
 
-            # 准备处理文件
             total_files = len(self.file_paths)
-            analysis_reports = []
+            self.status_label.configure(text=f"正在处理 {total_files} 个文件")
+
+            def update_progress(completed, total, file_path):
+                self.progress.set(completed / total)
+                self.status_label.configure(text=f"已完成 {os.path.basename(file_path)}（{completed}/{total}）")
+
+            jobs = pipeline.run(
+                self.file_paths,
+                self.target_lang.get(),
+                source_language=self.source_lang.get(),
+                resume=bool(self.resume_mode.get()),
+                progress_callback=update_progress
+            )
 
-            # 遍历文件并翻译
-            for index, file_path in enumerate(self.file_paths, 1):
-                try:
-                    # 更新进度
-                    self.progress.set(index / total_files)
-                    self.status_label.configure(text=f"正在处理 {os.path.basename(file_path)}")
-
-                    # 处理字幕
-                    output_path, analysis_path = subtitle_translator.process_subtitle_file(
-                        file_path,
-                        self.target_lang.get()
-                    )
-                    
-                    # 收集分析报告
-                    with open(analysis_path, 'r', encoding='utf-8') as f:
-                        analysis_reports.append({
-                            'file': os.path.basename(file_path),
-                            'report': f.read()
-                        })
-
-                except Exception as e:
-                    print(f"处理 {file_path} 时出错: {e}")
-                    traceback.print_exc()
-                    messagebox.showwarning("警告", f"处理 {os.path.basename(file_path)} 时出错: {e}")
+            # 收集分析报告
+            analysis_reports = []
+            for job in jobs:
+                if job.error is not None:
+                    messagebox.showwarning("警告", f"处理 {os.path.basename(job.file_path)} 时出错: {job.error}")
+                    continue
+                _, analysis_path = job.result
+                with open(analysis_path, 'r', encoding='utf-8') as f:
+                    analysis_reports.append({
+                        'file': os.path.basename(job.file_path),
+                        'report': f.read()
+                    })
+
+            translation_memory.close()
+            translator.close()
+            print(f"本次任务{metrics.summary()}")
 
             # 完成处理
             self.progress.set(1)
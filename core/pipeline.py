@@ -0,0 +1,193 @@
+import os
+import traceback
+import concurrent.futures
+
+from core.subtitle_translator import SmartSubtitleTranslator
+
+
+class _FileJob:
+    """流水线中单个文件的处理状态"""
+
+    def __init__(self, file_path, subtitle_translator):
+        self.file_path = file_path
+        self.subtitle_translator = subtitle_translator
+        self.source_hash = None  # 源文件内容的摘要，用于断点日志
+        self.subtitles = None
+        self.finished_texts = None
+        self.cache_key = None  # 分析报告的缓存键
+        self.chunk_texts = None  # 分段分析时的各段文本
+        self.chunk_reports = None  # 各段的分析结果
+        self.remaining_chunks = 0
+        self.translated_texts = None
+        self.remaining_lanes = 0
+        self.result = None  # (输出路径, 分析报告路径)
+        self.error = None
+        self.reported = False
+
+    @property
+    def ready_to_finish(self):
+        """已规划翻译且所有车道都已结束"""
+        return (self.error is None and self.result is None
+                and self.translated_texts is not None and self.remaining_lanes == 0)
+
+    @property
+    def done(self):
+        return self.error is not None or self.result is not None
+
+
+class MultiFilePipeline:
+    """
+    多文件并发翻译流水线
+
+    所有文件共用一个线程池（全局并发预算）和同一个翻译器（连接池与限流额度）。
+    各文件的内容分析同时进行，分析完成的文件立即把翻译车道加入共享队列，
+    某个文件收尾时空出的线程会被其他文件的车道填满，而不是等整个文件结束。
+    流水线总是使用线程池执行车道，不受 engine 参数影响。
+    """
+
+    def __init__(self, translator, max_workers=5, **translator_options):
+        """
+        :param translator: 所有文件共用的 Translator
+        :param max_workers: 全局并发数
+        :param translator_options: 传给每个文件的 SmartSubtitleTranslator 的其余参数
+        """
+        self.translator = translator
+        self.max_workers = max_workers
+        self.translator_options = translator_options
+
+    def run(self, file_paths, target_language, source_language=None, resume=False, progress_callback=None):
+        """
+        并发处理多个字幕文件
+
+        :param progress_callback: 每个文件完成时调用 callback(已完成数, 总数, 文件路径)
+        :return: 与 file_paths 对应的 _FileJob 列表，成功的 result 为 (输出路径, 分析报告路径)，失败的 error 为异常
+        """
+        jobs = []
+        for file_path in file_paths:
+            subtitle_translator = SmartSubtitleTranslator(
+                translator=self.translator,
+                max_workers=self.max_workers,
+                **self.translator_options
+            )
+            subtitle_translator.target_language = target_language
+            subtitle_translator.source_language = source_language
+            jobs.append(_FileJob(file_path, subtitle_translator))
+
+        completed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._analyze, job, resume): (job, 'analysis', None) for job in jobs}
+
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    job, stage, number = pending.pop(future)
+                    if stage == 'chunk':
+                        # 分段分析的一段完成（失败的段为None），全部完成后提交合并任务
+                        job.chunk_reports[number - 1] = future.result()
+                        job.remaining_chunks -= 1
+                        if job.remaining_chunks == 0:
+                            pending[executor.submit(self._merge_analysis, job, resume)] = (job, 'merge', None)
+                    elif stage in ('analysis', 'merge'):
+                        try:
+                            if future.result():
+                                # 分析完成：把该文件的车道加入共享线程池
+                                self._submit_lanes(executor, job, pending)
+                            else:
+                                # 需要分段分析：各段作为独立任务提交，与其他文件共用并发预算
+                                self._submit_chunks(executor, job, pending)
+                        except Exception as e:
+                            job.error = e
+                            print(f"处理 {job.file_path} 时出错: {e}")
+                            traceback.print_exc()
+                    else:
+                        job.remaining_lanes -= 1
+                        try:
+                            future.result()
+                        except Exception as e:
+                            # 车道内未完成的字幕会在保存时标记为处理失败
+                            print(f"处理字幕翻译任务时发生异常: {e}")
+
+                    if job.ready_to_finish:
+                        self._finish(job)
+                    if job.done and not job.reported:
+                        job.reported = True
+                        completed += 1
+                        if progress_callback:
+                            progress_callback(completed, len(jobs), job.file_path)
+
+        return jobs
+
+    def _analyze(self, job, resume):
+        """
+        读取文件、分析内容并打开断点日志（在工作线程中执行）
+
+        :return: 分析是否已完成；需要分段分析时返回 False，各段由 _submit_chunks 提交到共享线程池，
+                 而不是在工作线程中再开一个线程池
+        """
+        subtitle_translator = job.subtitle_translator
+        print(f"正在分析 {os.path.basename(job.file_path)}")
+        job.source_hash, job.subtitles = subtitle_translator.load_subtitle_file(job.file_path)
+        if subtitle_translator.analysis_mode == 'chunked':
+            chunk_texts = subtitle_translator.analysis_chunks(job.subtitles)
+            if len(chunk_texts) > 1:
+                job.cache_key, cached_summary = subtitle_translator.lookup_analysis_cache(job.subtitles)
+                if not cached_summary:
+                    print(f"分段分析：全文分为 {len(chunk_texts)} 段")
+                    job.chunk_texts = chunk_texts
+                    return False
+                job.finished_texts = subtitle_translator.open_checkpoint(job.file_path, job.source_hash, resume)
+                return True
+        # 只分析开头或全文只有一段：一次请求即可完成
+        subtitle_translator.prepare_context(job.subtitles)
+        job.finished_texts = subtitle_translator.open_checkpoint(job.file_path, job.source_hash, resume)
+        return True
+
+    def _submit_chunks(self, executor, job, pending):
+        """把各段的分析任务加入共享线程池"""
+        total = len(job.chunk_texts)
+        job.chunk_reports = [None] * total
+        job.remaining_chunks = total
+        for number, chunk_text in enumerate(job.chunk_texts, 1):
+            chunk_future = executor.submit(job.subtitle_translator.safe_analyze_chunk, chunk_text, number, total)
+            pending[chunk_future] = (job, 'chunk', number)
+
+    def _merge_analysis(self, job, resume):
+        """合并各段的分析结果并打开断点日志，返回 True 表示分析已完成"""
+        subtitle_translator = job.subtitle_translator
+        context_summary = subtitle_translator.combine_analyses(job.chunk_texts, job.chunk_reports)
+        subtitle_translator.finish_context(context_summary, job.cache_key)
+        job.finished_texts = subtitle_translator.open_checkpoint(job.file_path, job.source_hash, resume)
+        return True
+
+    def _submit_lanes(self, executor, job, pending):
+        """规划该文件的翻译车道并加入共享线程池"""
+        lanes = self._start_translation(job)
+        job.remaining_lanes = len(lanes)
+        for lane in lanes:
+            lane_future = executor.submit(
+                job.subtitle_translator.translate_lane,
+                lane, job.subtitles, job.translated_texts
+            )
+            pending[lane_future] = (job, 'lane', None)
+
+    def _start_translation(self, job):
+        """规划该文件的翻译车道"""
+        job.translated_texts, scheduler = job.subtitle_translator.plan_translation(
+            job.subtitles, job.finished_texts
+        )
+        return list(scheduler)
+
+    def _finish(self, job):
+        """所有车道完成后保存结果"""
+        subtitle_translator = job.subtitle_translator
+        try:
+            subtitle_translator.checkpoint.close()
+            job.result = subtitle_translator.save_results(
+                job.file_path,
+                job.subtitles,
+                subtitle_translator.finish_translation(job.translated_texts)
+            )
+            print(f"已完成 {os.path.basename(job.file_path)}")
+        except Exception as e:
+            job.error = e
+            print(f"保存 {job.file_path} 时出错: {e}")
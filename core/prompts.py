@@ -1,3 +1,139 @@
+"""
+提示词模板
+
+模板在导入时整理好，运行时只做少量拼接。翻译请求的布局为：
+    system：固定的翻译要求 + 本次任务的内容分析报告（同一任务内完全相同，作为稳定前缀）
+    user  ：本条字幕相关的词汇、上下文和待翻译文本（每次请求不同，放在最后）
+服务商的提示词缓存按前缀匹配，稳定前缀在同一任务的所有请求之间都能命中。
+"""
+from functools import lru_cache
+from textwrap import dedent
+
+
+TRANSLATION_INSTRUCTIONS = dedent("""\
+    你是一个专业的字幕翻译专家。
+
+    翻译要求：
+    1. 仅翻译"待翻译文本"部分
+    2. 保持原文的语气和风格，调整为更符合中文语境和逻辑的表达。整体语言风格应略带轻松但专业，以适应DND视频观众的预期。
+    3. 确保翻译自然流畅，便于视频观众理解，同时保留DND的奇幻氛围。
+    4. 严格只返回翻译结果，不要添加任何其他内容
+    5. 我会为你在待翻译文本前后提供它的上下文，请你不要翻译它们。
+    6. 当前句子翻译需参考上下文，但不得提前翻译后续句子的具体内容。
+    7. 翻译需为后续内容留出逻辑衔接空间，避免突兀地断句。
+    8. 当句子逻辑复杂时，可根据中文习惯断句，并将部分内容转移到下一句。例子：
+    示例：
+    英文原文：
+    第一句：
+    MARISHA: I mean, we could Stone Shape it and I could like Stone Shape it and bury it somewhere in
+    第二句：
+    our Keep.
+
+    理想翻译：
+    第一句：
+    玛丽莎：我的意思是，我们可以用「塑石术」把它变成石头，然后——
+    第二句：
+    埋在我们的「灰颅堡」某个地方。
+
+    9. 保持上下文的连贯性和整体语气一致，句间语义需自然衔接。
+    10. 禁止重复翻译上下文内容，仅使用当前句的信息完成翻译。
+    11. 程序会默认第一行为翻译结果，并自动截取第一行
+    12. 有关专有名词和法术等，使用「」标注
+    13. 专用词汇列表中的词条须使用列出的译文
+""")
+
+BATCH_INSTRUCTIONS = dedent("""\
+    你是一个专业的字幕翻译专家。
+
+    翻译要求：
+    1. 待翻译文本的每行以 [编号] 开头，每行是一条独立的字幕
+    2. 逐行翻译，输出同样行数，每行格式为 "[编号] 译文"，编号与原文一一对应
+    3. 不得合并、拆分、遗漏或新增编号，每条译文只占一行
+    4. 保持原文的语气和风格，调整为更符合中文语境和逻辑的表达，句间语义需自然衔接
+    5. 上文和下文仅供参考，不要翻译它们
+    6. 有关专有名词和法术等，使用「」标注
+    7. 严格只返回编号译文，不要添加任何其他内容
+    8. 专用词汇列表中的词条须使用列出的译文
+""")
+
+CONTEXT_SECTION = "\n以下是关于这个视频/内容的背景信息：\n\n{context_summary}\n"
+
+TRANSLATION_USER_TEMPLATE = dedent("""\
+    专用词汇列表（请在翻译时特别注意）：
+    {vocab}
+
+    已翻译上文（前10句）：
+    {prev_text}
+
+    未翻译下文（后10句）：
+    {next_text}
+
+    待翻译文本：
+    {text}
+
+    请只返回待翻译文本的翻译结果。""")
+
+BATCH_USER_TEMPLATE = dedent("""\
+    专用词汇列表（请在翻译时特别注意）：
+    {vocab}
+
+    上文（已翻译的部分为译文，仅供参考）：
+    {prev_text}
+
+    下文（仅供参考）：
+    {next_text}
+
+    待翻译文本共 {count} 行，请输出同样 {count} 行编号译文：
+    {numbered_text}""")
+
+ANALYSIS_INSTRUCTIONS = dedent("""\
+    请以专业的角度分析用户提供的字幕文本的整体内容，并提供详细且精准的分析报告：
+
+    1. 内容类型（如：电视剧、纪录片、访谈、教育视频等）
+    2. 主要主题和核心情节
+    3. 关键人物或角色特点，以及他们的固定翻译（同时列出英文原文和译文）
+    4. 特定的地点或场景，固定翻译（同时列出英文原文和译文）
+    5. 未包含在以下专用词汇列表中的新的特定专有名词（如果发现新的特定专有名词，请列出其英文原文及对应的建议译文，以便后续翻译固定）
+    6. 语言风格和语气特点
+    7. 可能的目标受众
+    {vocab_section}
+    请用简洁、专业的语言总结这些信息，为后续翻译提供指导。
+""")
+
+CHUNK_ANALYSIS_INSTRUCTIONS = dedent("""\
+    用户提供的是一部字幕全文中的一段（开头标注了段号）。请只根据这一段，简要列出：
+
+    1. 本段的主要情节
+    2. 出现的人物或角色，以及建议的固定翻译（同时列出英文原文和译文）
+    3. 出现的地点或场景，以及建议的固定翻译（同时列出英文原文和译文）
+    4. 未包含在以下专用词汇列表中的特定专有名词及建议译文
+    5. 语言风格和语气特点
+    {vocab_section}
+    只列出本段实际出现的内容，不要推测，不要添加其他说明。
+""")
+
+MERGE_ANALYSIS_INSTRUCTIONS = dedent("""\
+    用户提供的是同一部字幕按顺序分段分析的结果。请将它们合并为一份完整的分析报告：
+
+    1. 内容类型（如：电视剧、纪录片、访谈、教育视频等）
+    2. 主要主题和核心情节（按时间顺序概括全片）
+    3. 关键人物或角色特点，以及他们的固定翻译（同时列出英文原文和译文）
+    4. 特定的地点或场景，固定翻译（同时列出英文原文和译文）
+    5. 未包含在以下专用词汇列表中的新的特定专有名词（列出英文原文及对应的建议译文）
+    6. 语言风格和语气特点
+    7. 可能的目标受众
+    {vocab_section}
+    同一名词在不同段中的译文不一致时，只保留一个译文；不要遗漏只在某一段中出现的名词。
+    请用简洁、专业的语言总结这些信息，为后续翻译提供指导。
+""")
+
+NO_VOCAB_TEXT = "无特殊词汇"
+
+
+def _vocab_section(vocab):
+    return "\n专用词汇列表（如有）：\n" + "\n".join(vocab) + "\n" if vocab else ""
+
+
 class Prompts:
     @staticmethod
     def get_subtitle_translation_prompt(source_lang, target_lang):
@@ -11,3 +147,52 @@ class Prompts:
         4. Ensure translations are culturally appropriate
         5. Keep subtitle length similar to the original
         """
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def translation_system(context_summary):
+        """逐条翻译的系统提示词，同一任务内只生成一次"""
+        return TRANSLATION_INSTRUCTIONS + CONTEXT_SECTION.format(context_summary=context_summary)
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def batch_system(context_summary):
+        """批量翻译的系统提示词，同一任务内只生成一次"""
+        return BATCH_INSTRUCTIONS + CONTEXT_SECTION.format(context_summary=context_summary)
+
+    @staticmethod
+    def translation_user(text, prev_text, next_text, vocab):
+        """逐条翻译的用户消息：本条字幕的词汇、上下文和待翻译文本"""
+        return TRANSLATION_USER_TEMPLATE.format(
+            vocab="\n".join(vocab) if vocab else NO_VOCAB_TEXT,
+            prev_text=prev_text,
+            next_text=next_text,
+            text=text
+        )
+
+    @staticmethod
+    def batch_user(numbered_text, count, prev_text, next_text, vocab):
+        """批量翻译的用户消息"""
+        return BATCH_USER_TEMPLATE.format(
+            vocab="\n".join(vocab) if vocab else NO_VOCAB_TEXT,
+            prev_text=prev_text,
+            next_text=next_text,
+            count=count,
+            numbered_text=numbered_text
+        )
+
+    @staticmethod
+    def analysis_system(vocab):
+        return ANALYSIS_INSTRUCTIONS.format(vocab_section=_vocab_section(vocab))
+
+    @staticmethod
+    def chunk_analysis_system(vocab):
+        return CHUNK_ANALYSIS_INSTRUCTIONS.format(vocab_section=_vocab_section(vocab))
+
+    @staticmethod
+    def chunk_analysis_user(chunk_text, number, total):
+        return f"【第 {number}/{total} 段】\n{chunk_text}"
+
+    @staticmethod
+    def merge_analysis_system(vocab):
+        return MERGE_ANALYSIS_INSTRUCTIONS.format(vocab_section=_vocab_section(vocab))
@@ -0,0 +1,192 @@
+import re
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+
+# 可重试的HTTP状态码：限流、超时、冲突以及服务端错误
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value):
+    """
+    解析限流响应头中的时长
+
+    支持纯秒数（"12"、"0.5"）、OpenAI 风格的 "6m0s"、"20ms" 以及 HTTP 日期格式，
+    无法解析时返回None
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if parts:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _error_details(error):
+    """从 requests / aiohttp 的异常中取出 (状态码, 响应头)"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return getattr(response, 'status_code', None), getattr(response, 'headers', None) or {}
+    # aiohttp.ClientResponseError 直接携带 status 和 headers
+    return getattr(error, 'status', None), getattr(error, 'headers', None) or {}
+
+
+class RateLimiter:
+    """
+    按服务商共享的自适应限流器
+
+    - 用令牌桶同时约束每分钟请求数（RPM）和每分钟token数（TPM），所有工作线程共享
+    - 读取响应中的 Retry-After 和 x-ratelimit-* 头，额度耗尽时让所有请求一起等待
+    - 仅对可重试的错误使用带抖动的指数退避
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_backoff=60):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = now
+        self._blocked_until = now
+
+    @classmethod
+    def for_provider(cls, provider, requests_per_minute=None, tokens_per_minute=None):
+        """获取服务商共享的限流器，同一服务商的所有翻译器共用同一份额度"""
+        with cls._registry_lock:
+            limiter = cls._registry.get(provider)
+            if limiter is None:
+                limiter = cls(requests_per_minute, tokens_per_minute)
+                cls._registry[provider] = limiter
+            else:
+                # 以最新的配置为准
+                limiter.requests_per_minute = requests_per_minute
+                limiter.tokens_per_minute = tokens_per_minute
+            return limiter
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    def reserve(self, tokens=0):
+        """
+        预占一次请求的额度
+
+        :param tokens: 本次请求预计消耗的token数
+        :return: 发出请求前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            # 额度允许透支，透支部分折算为等待时间，保证先到先得
+            if self.requests_per_minute:
+                self._request_allowance -= 1
+                if self._request_allowance < 0:
+                    wait = max(wait, -self._request_allowance * 60 / self.requests_per_minute)
+            if self.tokens_per_minute and tokens:
+                # 单个请求超过整分钟额度时按满额计算，避免永远等待
+                self._token_allowance -= min(tokens, self.tokens_per_minute)
+                if self._token_allowance < 0:
+                    wait = max(wait, -self._token_allowance * 60 / self.tokens_per_minute)
+            return wait
+
+    def acquire(self, tokens=0):
+        """阻塞直到额度可用"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        """acquire 的 asyncio 版本"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """用响应中 usage 的实际token数修正预占的额度"""
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        with self._lock:
+            self._token_allowance -= actual_tokens - estimated_tokens
+
+    def block_for(self, seconds):
+        """让所有共享该限流器的请求暂停指定秒数"""
+        if seconds is None or seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """读取响应头中的限流信息：额度耗尽时暂停到重置时间"""
+        if not headers:
+            return
+        self.block_for(parse_duration(headers.get('Retry-After')))
+        for kind in ('requests', 'tokens'):
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            if remaining is None:
+                continue
+            try:
+                exhausted = float(remaining) <= 0
+            except ValueError:
+                continue
+            if exhausted:
+                self.block_for(parse_duration(headers.get(f'x-ratelimit-reset-{kind}')))
+
+    @staticmethod
+    def is_retryable(error):
+        """判断错误是否值得重试：鉴权、参数等客户端错误重试也不会成功"""
+        status, _ = _error_details(error)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES
+        # 连接错误、超时和空结果（ValueError）都可以重试
+        return True
+
+    def retry_delay(self, attempt, error, base_delay=2):
+        """
+        计算第 attempt 次失败后的重试等待时间
+
+        :param attempt: 已失败的次数，从0开始
+        :param error: 捕获到的异常
+        :param base_delay: 指数退避的基础延迟（秒）
+        :return: 等待秒数；不可重试的错误返回None
+        """
+        if not self.is_retryable(error):
+            return None
+        _, headers = _error_details(error)
+        retry_after = parse_duration(headers.get('Retry-After')) if headers else None
+        if retry_after is not None:
+            # 服务端明确给出等待时间：所有工作线程一起暂停，而不是各自重试
+            self.block_for(retry_after)
+            return retry_after
+        backoff = min(self.max_backoff, base_delay * (2 ** attempt))
+        # 等值抖动：一半固定，一半随机，避免所有线程同时重试
+        return backoff / 2 + random.uniform(0, backoff / 2)
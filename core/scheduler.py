@@ -0,0 +1,43 @@
+class LaneScheduler:
+    """
+    依赖感知的翻译调度器
+
+    每条字幕都以前文的译文作为上下文，即第 i 条依赖第 i-1 条。若所有字幕同时提交，
+    前文几乎都还是原文。这里把待翻译单元（单条字幕的位置或批次区间）按顺序切分为
+    若干连续的车道：车道内串行翻译，前文译文总能先于后文完成；车道之间并行，
+    并行度等于车道数。只有每条车道的第一个单元拿不到已翻译的上文。
+    """
+
+    def __init__(self, units, lane_count, weight=None):
+        """
+        :param units: 按字幕顺序排列的待翻译单元
+        :param lane_count: 车道数，通常等于并发数
+        :param weight: 计算单元工作量的函数，默认每个单元为1
+        """
+        self.units = list(units)
+        weight = weight or (lambda unit: 1)
+        self.lanes = self._split_lanes([weight(unit) for unit in self.units], lane_count)
+
+    def _split_lanes(self, weights, lane_count):
+        """按累计工作量把单元均匀切分为连续的车道"""
+        lane_count = max(1, min(lane_count, len(self.units)))
+        total = sum(weights)
+        lanes = []
+        current = []
+        accumulated = 0
+        for unit, unit_weight in zip(self.units, weights):
+            current.append(unit)
+            accumulated += unit_weight
+            # 达到当前车道的目标累计量时切换到下一条车道
+            if len(lanes) < lane_count - 1 and accumulated >= total * (len(lanes) + 1) / lane_count:
+                lanes.append(current)
+                current = []
+        if current:
+            lanes.append(current)
+        return lanes
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def __iter__(self):
+        return iter(self.lanes)
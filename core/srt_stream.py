@@ -0,0 +1,148 @@
+import io
+import re
+
+
+TIMESTAMP_LINE_PATTERN = re.compile(
+    r'^\s*(\d{1,2}):(\d{1,2}):(\d{1,2})[,.:](\d{1,3})\s*-->\s*(\d{1,2}):(\d{1,2}):(\d{1,2})[,.:](\d{1,3})'
+)
+# 规范写法的快速路径，绝大多数文件只会走这里
+CANONICAL_TIMESTAMP_PATTERN = re.compile(r'(\d\d:\d\d:\d\d,\d\d\d) --> (\d\d:\d\d:\d\d,\d\d\d)')
+
+
+class Subtitle:
+    def __init__(self, index, timestamp_in, timestamp_out, text):
+        self.index = index
+        self.timestamp_in = timestamp_in
+        self.timestamp_out = timestamp_out
+        self.text = text
+
+
+def _format_timestamp(hours, minutes, seconds, millis):
+    # 毫秒部分按小数处理："1,5" 即 1.5 秒
+    return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d},{millis.ljust(3, '0')}"
+
+
+def timestamp_to_ms(timestamp):
+    """将 "00:01:02,345" 转换为毫秒"""
+    hours, minutes, rest = timestamp.split(':')
+    seconds, millis = rest.replace('.', ',').split(',')
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def ms_to_timestamp(ms):
+    """将毫秒转换为 "00:01:02,345"，负数按0处理"""
+    ms = max(0, int(ms))
+    seconds, millis = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def parse_timestamp_line(line):
+    """解析时间轴行，返回规范化的 (开始, 结束)，不是时间轴时返回None"""
+    if '-->' not in line:
+        return None
+    match = CANONICAL_TIMESTAMP_PATTERN.match(line)
+    if match:
+        return match.groups()
+    match = TIMESTAMP_LINE_PATTERN.match(line)
+    if not match:
+        return None
+    groups = match.groups()
+    return _format_timestamp(*groups[:4]), _format_timestamp(*groups[4:])
+
+
+def _lines(source):
+    """把文件对象、字符串或字节统一为逐行迭代，去掉首尾空白"""
+    if isinstance(source, bytes):
+        source = source.decode('utf-8-sig')
+    if isinstance(source, str):
+        # newline=None：统一 \r\n 和 \r
+        source = io.StringIO(source, newline=None)
+    first = True
+    for line in source:
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line.strip()
+
+
+def hashed_lines(source, hasher):
+    """逐行读取文本文件对象，同时把读到的内容（UTF-8编码）累加到 hasher，不需要保留整个文件"""
+    for line in source:
+        hasher.update(line.encode('utf-8'))
+        yield line
+
+
+def iter_subtitles(source):
+    """
+    流式解析SRT，逐条产出 Subtitle，内存占用与文件大小无关
+
+    兼容常见的不规范写法：BOM、\\r\\n 换行、行尾空格、缺少结尾换行、缺少序号、
+    时间轴使用 "." 分隔毫秒，以及字幕文本中夹杂的空行。这些写法会被规范化：时间轴改写为
+    HH:MM:SS,mmm 且丢弃其后的坐标，文本行去除首尾空白，文本中的空行被去掉。
+
+    :param source: 文本模式的文件对象、字符串或字节
+    """
+    index = None
+    timestamps = None
+    text_lines = []
+    candidate_index = None  # 纯数字行：下一行是时间轴时才是序号，否则属于字幕文本
+    count = 0
+
+    for line in _lines(source):
+        parsed = parse_timestamp_line(line)
+
+        if parsed is not None:
+            if timestamps is not None:
+                count += 1
+                yield Subtitle(index or str(count), timestamps[0], timestamps[1], "\n".join(text_lines))
+            index = candidate_index
+            candidate_index = None
+            timestamps = parsed
+            text_lines = []
+            continue
+
+        if candidate_index is not None:
+            if timestamps is not None:
+                text_lines.append(candidate_index)
+            candidate_index = None
+
+        if line.isdigit():
+            candidate_index = line
+        elif line and timestamps is not None:
+            # 空行只是分隔符；字幕文本中夹杂的空行不会截断字幕
+            text_lines.append(line)
+
+    if candidate_index is not None and timestamps is not None:
+        text_lines.append(candidate_index)
+    if timestamps is not None:
+        count += 1
+        yield Subtitle(index or str(count), timestamps[0], timestamps[1], "\n".join(text_lines))
+
+
+def format_subtitle(subtitle, text=None):
+    """格式化单条字幕块"""
+    text = subtitle.text if text is None else text
+    return f"{subtitle.index}\n{subtitle.timestamp_in} --> {subtitle.timestamp_out}\n{text}\n\n"
+
+
+def write_subtitles(stream, subtitles, texts=None):
+    """
+    流式写出SRT，逐条写入不拼接整个文件
+
+    :param stream: 文本模式的文件对象
+    :param subtitles: 字幕的可迭代对象
+    :param texts: 可选的替换文本（如译文），与字幕一一对应
+    :return: 写出的字幕条数
+    """
+    count = 0
+    if texts is None:
+        for subtitle in subtitles:
+            stream.write(format_subtitle(subtitle))
+            count += 1
+    else:
+        for subtitle, text in zip(subtitles, texts):
+            stream.write(format_subtitle(subtitle, text))
+            count += 1
+    return count
@@ -0,0 +1,158 @@
+from array import array
+
+from core.srt_stream import iter_subtitles, write_subtitles, timestamp_to_ms, ms_to_timestamp
+
+
+class Cue:
+    """SubtitleTrack 中单条字幕的轻量视图，接口与 Subtitle 一致"""
+    __slots__ = ('track', 'position')
+
+    def __init__(self, track, position):
+        self.track = track
+        self.position = position
+
+    @property
+    def index(self):
+        return self.track.index_at(self.position)
+
+    @property
+    def start(self):
+        """开始时间（毫秒）"""
+        return self.track.starts[self.position]
+
+    @property
+    def end(self):
+        """结束时间（毫秒）"""
+        return self.track.ends[self.position]
+
+    @property
+    def timestamp_in(self):
+        return ms_to_timestamp(self.start)
+
+    @property
+    def timestamp_out(self):
+        return ms_to_timestamp(self.end)
+
+    @property
+    def text(self):
+        return self.track.text_at(self.position)
+
+    def __repr__(self):
+        return f"Cue({self.index!r}, {self.timestamp_in!r}, {self.timestamp_out!r}, {self.text!r})"
+
+
+class SubtitleTrack:
+    """
+    紧凑的字幕轨道
+
+    时间轴以整数毫秒保存在 array 中，所有字幕文本拼接为一个字符串并记录偏移量，
+    序号只在与位置不连续时单独记录。每条字幕不再是一个带 __dict__ 的对象，
+    一次处理整个片库时内存占用约为 Subtitle 列表的几分之一。
+    可以直接替代字幕列表传给 SmartSubtitleTranslator（支持 len、下标、切片和迭代）。
+
+    对规范的SRT（HH:MM:SS,mmm 时间轴、字幕文本中没有空行），解析后再写出与原文件一致
+    （序号原样保留，包括 '007' 这类写法）。不规范的写法会在解析时规范化，写出后无法还原：
+    时间轴之后的坐标（如 X1:1）被丢弃，"." 分隔或不足三位的毫秒改写为规范格式，
+    字幕文本中的空行和行首尾空白被去除，\r\n 换行和 BOM 不保留。
+    """
+    __slots__ = ('starts', 'ends', 'indices', '_offsets', '_text', '_index_overrides')
+
+    def __init__(self, starts, ends, texts, indices=None):
+        """
+        :param starts: 开始时间（毫秒）序列
+        :param ends: 结束时间（毫秒）序列
+        :param texts: 字幕文本序列
+        :param indices: 可选的序号字符串序列，默认从1开始编号
+        """
+        self.starts = array('q', starts)
+        self.ends = array('q', ends)
+        self._offsets = array('q', [0])
+        parts = []
+        total = 0
+        for text in texts:
+            parts.append(text)
+            total += len(text)
+            self._offsets.append(total)
+        self._text = ''.join(parts)
+        if not len(self.starts) == len(self.ends) == len(self._offsets) - 1:
+            raise ValueError("开始时间、结束时间和文本的数量不一致")
+        self.indices = None
+        self._index_overrides = {}
+        if indices is not None:
+            self._set_indices(indices)
+
+    def _set_indices(self, indices):
+        # 序号按整数存储；以 0 开头等无法还原的写法单独记录原文
+        values = array('q')
+        for position, index in enumerate(indices):
+            index = str(index)
+            value = int(index) if index.isdecimal() else position + 1
+            if str(value) != index:
+                self._index_overrides[position] = index
+            values.append(value)
+        if any(value != position + 1 for position, value in enumerate(values)):
+            self.indices = values
+
+    @classmethod
+    def from_subtitles(cls, subtitles):
+        """由 Subtitle（或任何带 index/timestamp_in/timestamp_out/text 的对象）构建"""
+        starts, ends, texts, indices = array('q'), array('q'), [], []
+        for subtitle in subtitles:
+            starts.append(timestamp_to_ms(subtitle.timestamp_in))
+            ends.append(timestamp_to_ms(subtitle.timestamp_out))
+            texts.append(subtitle.text)
+            indices.append(subtitle.index)
+        return cls(starts, ends, texts, indices)
+
+    @classmethod
+    def parse(cls, source):
+        """流式解析SRT（文件对象、字符串或字节）"""
+        return cls.from_subtitles(iter_subtitles(source))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [Cue(self, position) for position in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("字幕位置超出范围")
+        return Cue(self, key)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield Cue(self, position)
+
+    def index_at(self, position):
+        override = self._index_overrides.get(position)
+        if override is not None:
+            return override
+        if self.indices is None:
+            return str(position + 1)
+        return str(self.indices[position])
+
+    def text_at(self, position):
+        return self._text[self._offsets[position]:self._offsets[position + 1]]
+
+    def texts(self):
+        """按顺序返回所有字幕文本"""
+        return [self.text_at(position) for position in range(len(self))]
+
+    def with_timing(self, starts, ends):
+        """返回文本和序号不变、时间轴替换为给定毫秒值的新轨道"""
+        track = SubtitleTrack.__new__(SubtitleTrack)
+        track.starts = array('q', starts)
+        track.ends = array('q', ends)
+        if not len(track.starts) == len(track.ends) == len(self):
+            raise ValueError("时间轴数量与字幕条数不一致")
+        track._offsets = self._offsets
+        track._text = self._text
+        track.indices = self.indices
+        track._index_overrides = self._index_overrides
+        return track
+
+    def write(self, stream, texts=None):
+        """以SRT格式写出，可选替换文本（如译文）"""
+        return write_subtitles(stream, self, texts)
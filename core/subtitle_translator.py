@@ -1,92 +1,99 @@
+import io
 import os
 import re
 import time
+import asyncio
+import hashlib
 import random
 import traceback
 import concurrent.futures
+from collections import Counter
 from typing import List, Tuple, Optional
 
-import tiktoken
-
-class Subtitle:
-    def __init__(self, index, timestamp_in, timestamp_out, text):
-        self.index = index
-        self.timestamp_in = timestamp_in
-        self.timestamp_out = timestamp_out
-        self.text = text
+from core.srt_stream import Subtitle, iter_subtitles, hashed_lines, write_subtitles
+from core.subtitle_track import SubtitleTrack
+from core.rate_limiter import RateLimiter
+from core.scheduler import LaneScheduler
+from core.checkpoint import CheckpointJournal
+from core.incremental import align_subtitles
+from core.tokenizer import count_tokens, chunk_by_tokens
+from core.glossary import GlossaryMatcher
+from core.cue_classifier import CueClassifier, REASON_LABELS
+from core.metrics import metrics
+from core.prompts import Prompts
 
 class SmartSubtitleTranslator:
+    # 批量模式下编号行的解析规则，兼容 "[3] 译文"、"3. 译文"、"3：译文" 等写法
+    NUMBERED_LINE_PATTERN = re.compile(r'^\s*\[?(\d+)\]?\s*[.:：、)）]?\s*(.*)$')
+    # 输出token上限相对原文token数的倍数
+    OUTPUT_TOKEN_RATIO = 4
+    # 批量模式下同一批内允许跳过的连续字幕条数（已有译文或重复的字幕）
+    MAX_BATCH_GAP = 3
+
     def __init__(self, translator, max_workers=5, max_tokens=2000, 
-                 max_retries=3, retry_delay_base=30, custom_vocab=None):
+                 max_retries=3, retry_delay_base=2, custom_vocab=None,
+                 batch_mode=False, max_batch_size=40, translation_memory=None,
+                 engine='thread', output_dir=None, analysis_mode='head', analysis_chunk_tokens=3000,
+                 analysis_cache=None, deduplicator=None, passthrough=True, passthrough_sound_tags=True,
+                 metrics_format='json'):
         self.translator = translator
         self.max_workers = max_workers
-        self.max_tokens = max_tokens
+        self.max_tokens = max_tokens  # 批量模式下每批字幕的token预算
+        self.batch_mode = batch_mode  # 是否将多条字幕合并为一次请求
+        self.max_batch_size = max_batch_size  # 每批最多包含的字幕条数
+        self.engine = engine  # 'thread'：线程池；'async'：asyncio 引擎，max_workers 即在途请求上限
         self.max_retries = max_retries  # 最大重试次数
-        self.retry_delay_base = retry_delay_base  # 基础重试延迟
+        self.retry_delay_base = retry_delay_base  # 指数退避的基础重试延迟（秒）
         self.context_summary = None
         self.target_language = None
         self.source_language = None
         self.custom_vocab = custom_vocab or []  # 新增自定义词汇属性
+        self._glossary = None  # 专用词汇的匹配器，首次使用时建立
+        self.translation_memory = translation_memory  # 可选的翻译记忆库（TranslationMemory）
+        self._default_rate_limiter = RateLimiter()  # 翻译器自身不带限流器时用于计算退避
+        self.checkpoint = None  # 处理文件期间的断点日志（CheckpointJournal）
+        self.output_dir = output_dir  # 译文和分析报告的输出目录，默认与源文件相同
+        self.analysis_mode = analysis_mode  # 'head'：只分析开头；'chunked'：分段并发分析全文后合并
+        self.analysis_chunk_tokens = analysis_chunk_tokens  # 分段分析时每段的token预算
+        self.analysis_cache = analysis_cache  # 可选的分析报告缓存（AnalysisCache）
+        self.deduplicator = deduplicator  # 可选的字幕去重器（CueDeduplicator），多个文件可共用
+        self._followers = {}  # 去重后 {首次出现的位置: [重复字幕的位置, ...]}
+        self.passthrough = passthrough  # 是否在本地识别无需翻译的字幕（纯符号、网址、已是目标语言等）并原样保留
+        self.passthrough_sound_tags = passthrough_sound_tags  # 是否原样保留只含音效标签的字幕
+        self.passthrough_count = 0  # 最近一次翻译中原样保留的字幕数
+        self.metrics_format = metrics_format  # 每个文件的指标导出格式：json / prometheus / both / none
+        self.metrics_scope = None  # 当前文件在指标中的范围（文件路径）
+
+        # 让翻译器的连接池与并发数一致，每个工作线程都能复用长连接
+        if hasattr(translator, 'configure_pool'):
+            translator.configure_pool(max_workers)
 
     def count_tokens(self, text):
-        try:
-            tokenizer = tiktoken.get_encoding("cl100k_base")
-            return len(tokenizer.encode(text))
-        except ImportError:
-            return len(text.split())
+        """使用进程内共享的分词器计数"""
+        return count_tokens(text)
 
     def parse_subtitles(self, content):
         """解析SRT文件"""
-        # 处理不同的换行符和编码问题
-        content = content.replace('\r\n', '\n')
-        
-        pattern = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)(?=\n\n|\Z)'
-        matches = re.findall(pattern, content, re.DOTALL | re.MULTILINE)
-        
-        subtitles = []
-        for match in matches:
-            index, timestamp_in, timestamp_out, text = match
-            subtitles.append(Subtitle(
-                index=index, 
-                timestamp_in=timestamp_in, 
-                timestamp_out=timestamp_out, 
-                text=text.strip()
-            ))
-        
-        return subtitles
+        return list(iter_subtitles(content))
+
+    def analyze_content(self, full_text, max_chars=2500):
+        """
+        第一阶段：分析整体内容，生成上下文摘要
 
-    def analyze_content(self, full_text):
-        """第一阶段：分析整体内容，生成上下文摘要"""
+        :param max_chars: 只分析开头这么多字符，None 表示分析全部文本
+        """
         # 如果文本太短，直接返回None
         if len(full_text.strip()) < 50:
             print("文本内容过短，无法进行分析")
             return None
-    
-        # 准备专用词汇部分
-        vocab_section = "\n专用词汇列表（如有）：\n" + "\n".join(self.custom_vocab) if self.custom_vocab else ""
-    
-        analysis_prompt = f"""
-        请以专业的角度分析以下字幕文本的整体内容，并提供详细且精准的分析报告：
-    
-        1. 内容类型（如：电视剧、纪录片、访谈、教育视频等）
-        2. 主要主题和核心情节
-        3. 关键人物或角色特点，以及他们的固定翻译（同时列出英文原文和译文）
-        4. 特定的地点或场景，固定翻译（同时列出英文原文和译文）
-        5. 未包含在以下专用词汇列表中的新的特定专有名词（如果发现新的特定专有名词，请列出其英文原文及对应的建议译文，以便后续翻译固定）
-        6. 语言风格和语气特点
-        7. 可能的目标受众
-    
-        {vocab_section}
-    
-        请用简洁、专业的语言总结这些信息，为后续翻译提供指导。
-    
-        文本内容（前2500字）：
-        {full_text[:2500]}
-        """
+
+        analysis_text = full_text[:max_chars] if max_chars else full_text
+        # 专用词汇只列出分析文本中出现的词条；待分析文本作为用户消息发送
+        analysis_prompt = Prompts.analysis_system(self.relevant_vocab(analysis_text))
         
         try:
             context_summary = self.translator.translate(
-                text=full_text[:2500],  # 只分析前2500字
+                text=analysis_text,
                 system_prompt=analysis_prompt,
                 temperature=0.3
             )
@@ -103,235 +110,880 @@ class SmartSubtitleTranslator:
             return None
 
 
-    def translate_with_context(self, subtitles):
-        """第二阶段：基于上下文进行批量翻译"""
+    def analyze_content_chunked(self, subtitles):
+        """
+        分段分析全文：按token预算切分字幕，各段并发提取人物、地点和专有名词，
+        再合并为一份与 analyze_content 格式相同的报告
+        """
+        chunk_texts = self.analysis_chunks(subtitles)
+        if len(chunk_texts) <= 1:
+            # 全文在一段的token预算之内，直接完整分析，不截取开头
+            return self.analyze_content("\n".join(chunk_texts), max_chars=None)
+
+        print(f"分段分析：全文分为 {len(chunk_texts)} 段")
+        # 单个文件独立处理时使用自己的线程池；多文件流水线把各段作为独立任务提交到共享线程池
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunk_texts))) as executor:
+            partial_reports = list(executor.map(
+                self.safe_analyze_chunk, chunk_texts, range(1, len(chunk_texts) + 1), [len(chunk_texts)] * len(chunk_texts)
+            ))
+        return self.combine_analyses(chunk_texts, partial_reports)
+
+    def analysis_chunks(self, subtitles):
+        """按 analysis_chunk_tokens 切分全文，返回各段文本"""
+        texts = [subtitle.text for subtitle in subtitles]
+        return ["\n".join(texts[start:end]) for start, end in chunk_by_tokens(texts, self.analysis_chunk_tokens)]
+
+    def combine_analyses(self, chunk_texts, partial_reports):
+        """
+        合并各段的分析结果
+
+        :param partial_reports: 与 chunk_texts 对应的分析结果，失败的段为None
+        :return: 合并后的报告，所有段都失败时返回None
+        """
+        partial_reports = [(number, report) for number, report in enumerate(partial_reports, 1) if report]
+        if not partial_reports:
+            return None
+        return self.merge_analyses(partial_reports, self.relevant_vocab(*chunk_texts))
+
+    def safe_analyze_chunk(self, chunk_text, number, total):
+        """分析一段，失败时返回None（失败的段在合并时跳过）"""
+        try:
+            return self.analyze_chunk(chunk_text, number, total)
+        except Exception as e:
+            print(f"第 {number} 段内容分析失败: {e}")
+            return None
+
+    def analyze_chunk(self, chunk_text, number, total):
+        """分析全文中的一段，只提取本段出现的信息"""
+        chunk_prompt = Prompts.chunk_analysis_system(self.relevant_vocab(chunk_text))
+        with metrics.scope(self.metrics_scope):
+            report = self.translator.translate(
+                text=Prompts.chunk_analysis_user(chunk_text, number, total),
+                system_prompt=chunk_prompt,
+                temperature=0.3
+            )
+        return report.strip() if report else None
+
+    def merge_analyses(self, partial_reports, vocab=None):
+        """
+        将各段的分析结果合并为一份报告
+
+        :param partial_reports: [(段号, 分析结果), ...]
+        :param vocab: 全文中出现的专用词汇
+        :return: 合并后的报告；合并请求失败时直接拼接各段结果
+        """
+        combined = "\n\n".join(f"【第 {number} 段】\n{report}" for number, report in partial_reports)
+        merge_prompt = Prompts.merge_analysis_system(vocab)
+        try:
+            with metrics.scope(self.metrics_scope):
+                context_summary = self.translator.translate(
+                    text=combined,
+                    system_prompt=merge_prompt,
+                    temperature=0.3
+                )
+            if context_summary and context_summary.strip():
+                return context_summary
+            print("合并分析结果返回为空，使用各段的分析结果")
+        except Exception as e:
+            print(f"合并分析结果失败: {e}，使用各段的分析结果")
+        return combined
+
+    @property
+    def glossary(self):
+        """专用词汇的多模式匹配器，词汇列表变化后自动重建"""
+        vocab = tuple(self.custom_vocab)
+        if self._glossary is None or self._glossary.entries != vocab:
+            self._glossary = GlossaryMatcher(vocab)
+        return self._glossary
+
+    def relevant_vocab(self, *texts):
+        """专用词汇中在给定文本里出现的词条"""
+        if not self.custom_vocab:
+            return []
+        return self.glossary.relevant_entries(*texts)
+
+    def get_context(self, position, subtitles, translated_texts, prev_count=10, next_count=10):
+        """
+        获取字幕的上下文
+        
+        :param position: 当前字幕在列表中的位置
+        :param subtitles: 所有字幕列表
+        :param translated_texts: 共享的翻译结果列表，已翻译的上文优先使用译文
+        :return: (上文列表, 下文文本)
+        """
+        prev_context = []
+        for i in range(max(0, position - prev_count), position):
+            if translated_texts[i] is not None:
+                prev_context.append(translated_texts[i])
+            else:
+                prev_context.append(subtitles[i].text)
+
+        next_context = subtitles[position + 1:min(len(subtitles), position + 1 + next_count)]
+        next_text = "\n".join([s.text for s in next_context])
+        return prev_context, next_text
+
+    def build_translation_prompt(self, subtitle, prev_context, next_text):
+        """
+        构建单条字幕的翻译请求
+
+        :return: (系统提示词, 用户消息)；系统提示词在同一任务内保持不变，便于服务商缓存前缀
+        """
+        prev_text = "\n".join(prev_context)
+        # 只附上本条字幕及其上下文中出现的词条
+        vocab = self.relevant_vocab(subtitle.text, prev_text, next_text)
+        return (
+            Prompts.translation_system(self.context_summary),
+            Prompts.translation_user(subtitle.text, prev_text, next_text, vocab)
+        )
+
+    def build_batch_prompt(self, positions, subtitles, translated_texts=None):
+        """
+        构建一批字幕的编号翻译请求
+        
+        :param positions: 本批字幕的位置（升序，可以不连续）
+        :param subtitles: 所有字幕列表
+        :param translated_texts: 共享的翻译结果列表，已翻译的上文优先使用译文
+        :return: (编号后的待翻译文本, 系统提示词, 用户消息)
+        """
+        batch = [subtitles[position] for position in positions]
+        start = positions[0] if positions else 0
+        end = positions[-1] + 1 if positions else 0
+        numbered_text = "\n".join(
+            f"[{number}] {subtitle.text.replace(chr(10), ' ')}"
+            for number, subtitle in enumerate(batch, 1)
+        )
+        prev_context, _ = self.get_context(
+            start, subtitles, translated_texts or [None] * len(subtitles), prev_count=5, next_count=0
+        )
+        prev_text = "\n".join(prev_context)
+        next_text = "\n".join(s.text for s in subtitles[end:end + 5])
+        vocab = self.relevant_vocab(numbered_text, prev_text, next_text)
+        return (
+            numbered_text,
+            Prompts.batch_system(self.context_summary),
+            Prompts.batch_user(numbered_text, len(batch), prev_text, next_text, vocab)
+        )
+
+    def output_limits(self, text, lines=None):
+        """
+        翻译请求的输出限制：输出token上限、停止序列，以及流式模式下需要接收的行数
+
+        :param text: 待翻译文本
+        :param lines: 批量模式下的编号行数；逐条翻译时为None，只需要第一行
+        """
+        # 译文的token数按原文的数倍估算，每行另留出编号等余量
+        limits = {
+            'max_tokens': self.count_tokens(text) * self.OUTPUT_TOKEN_RATIO + 32 * (lines or 1),
+            'max_lines': lines or 1
+        }
+        if lines is None:
+            # 逐条翻译只保留第一行，模型在空行后追加的解释无需生成
+            limits['stop'] = ["\n\n"]
+        return limits
+
+    def clean_translation(self, translated_text):
+        """检查翻译结果并截取第一行"""
+        if not translated_text or translated_text.strip() == '':
+            raise ValueError("翻译结果为空")
+        # 移除可能的额外描述
+        return translated_text.strip().split('\n')[0].strip()
+
+    @staticmethod
+    def failure_text(subtitle, error):
+        """重试用尽后的兜底文本：返回原文并附加错误标记"""
+        if isinstance(error, ValueError):
+            # 如果是值错误（如空结果），返回原文并附加错误标记
+            return f"[翻译失败] {subtitle.text}"
+        # 对于其他类型错误，返回原文并附加详细错误信息
+        return f"[翻译错误：{str(error)}] {subtitle.text}"
+
+    def retry_delay(self, attempt, error):
+        """计算重试等待时间，不可重试的错误返回None"""
+        rate_limiter = getattr(self.translator, 'rate_limiter', None)
+        if rate_limiter is None:
+            rate_limiter = self._default_rate_limiter
+        return rate_limiter.retry_delay(attempt, error, base_delay=self.retry_delay_base)
+
+    def safe_translate_subtitle(self, position, subtitles, translated_texts):
+        """
+        安全的字幕翻译方法，支持部分并发翻译
+        
+        :param position: 当前字幕在列表中的位置
+        :param subtitles: 所有字幕列表
+        :param translated_texts: 共享的翻译结果列表
+        :return: 翻译结果或错误信息
+        """
+        subtitle = subtitles[position]
+        prev_context, next_text = self.get_context(position, subtitles, translated_texts)
+
+        system_prompt, user_prompt = self.build_translation_prompt(subtitle, prev_context, next_text)
+
+        for retry in range(self.max_retries):
+            try:
+                translated_text = self.translator.translate(
+                    text=user_prompt,
+                    system_prompt=system_prompt,
+                    temperature=0.7,
+                    **self.output_limits(subtitle.text)
+                )
+                return self.clean_translation(translated_text)
+
+            except Exception as e:
+                # 记录错误
+                print(f"翻译字幕 {subtitle.index} 失败（第 {retry + 1} 次尝试）: {e}")
+
+                # 不可重试的错误或最后一次重试仍失败
+                delay = self.retry_delay(retry, e)
+                if delay is None or retry == self.max_retries - 1:
+                    return self.failure_text(subtitle, e)
+                metrics.increment('retries')
+                # 重试间隔：服务端给出的 Retry-After 或带抖动的指数退避
+                time.sleep(delay)
+
+        # 理论上不会执行到这里，但保险起见
+        return f"[翻译失败] {subtitle.text}"
+
+    def translate_with_context(self, subtitles, finished_texts=None):
+        """
+        第二阶段：基于上下文进行批量翻译
+        
+        :param subtitles: 所有字幕列表
+        :param finished_texts: 已完成的翻译 {位置: 译文}（如从断点日志恢复），不再重复请求
+        """
+        if self.engine == 'async':
+            # asyncio 引擎：同步接口只是一层包装，不能在已运行的事件循环中调用
+            return asyncio.run(self.translate_with_context_async(subtitles, finished_texts=finished_texts))
+
+        translated_texts, scheduler = self.plan_translation(subtitles, finished_texts)
+
+        # 使用线程池并行执行各车道
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            lane_futures = [
+                executor.submit(self.translate_lane, lane, subtitles, translated_texts)
+                for lane in scheduler
+            ]
+            for future in concurrent.futures.as_completed(lane_futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"处理字幕翻译任务时发生异常: {e}")
+
+        return self.finish_translation(translated_texts)
+
+    def plan_translation(self, subtitles, finished_texts=None):
+        """
+        准备翻译：查询翻译记忆，并把待翻译单元划分为车道
+        
+        :param subtitles: 所有字幕列表
+        :param finished_texts: 已完成的翻译 {位置: 译文}，不再重复请求
+        :return: (预填了已有译文的共享结果列表, LaneScheduler)
+        """
         if not self.context_summary:
             print("警告：未进行内容分析，将使用默认翻译")
             self.context_summary = f"这是一个需要翻译的字幕文件。请保持原文的语气和风格。"
-    
+
+        # 本地识别无需翻译的字幕，原样保留
+        passthrough_texts = self.classify_passthrough(subtitles, skip=finished_texts)
+
+        # 再查询翻译记忆，命中的字幕不再请求API
+        cached_texts = self.lookup_memory(subtitles, skip=passthrough_texts.keys() | (finished_texts or {}).keys())
+        if self.translation_memory is not None:
+            print(f"翻译记忆命中 {len(cached_texts)}/{len(subtitles)} 条字幕")
+        metrics.increment('memory_hits', len(cached_texts), scope=self.metrics_scope)
+        metrics.increment('passthrough', len(passthrough_texts), scope=self.metrics_scope)
+        cached_texts.update(passthrough_texts)
+        cached_texts.update(finished_texts or {})
+
+        # 相同的字幕只翻译一次，重复的字幕不进入调度，译文在首次出现的字幕完成后分发
+        followers = self.plan_deduplication(subtitles, cached_texts)
+
         # 创建一个用于存储已翻译结果的共享列表
         translated_texts = [None] * len(subtitles)
-    
-        def safe_translate_subtitle(subtitle, context_summary, subtitles, translated_texts):
-            """
-            安全的字幕翻译方法，支持部分并发翻译
-            
-            :param subtitle: 当前字幕对象
-            :param context_summary: 上下文摘要
-            :param subtitles: 所有字幕列表
-            :param translated_texts: 共享的翻译结果列表
-            :return: 翻译结果或错误信息
-            """
-            current_index = subtitles.index(subtitle)
-            
-            # 获取已翻译的前文（如果有）
-            prev_context = []
-            for i in range(max(0, current_index-10), current_index):
-                if translated_texts[i] is not None:
-                    prev_context.append(translated_texts[i])
+        for position, cached_text in cached_texts.items():
+            translated_texts[position] = cached_text
+
+        # 待翻译单元：批量模式下为批次区间，否则为单条字幕的位置
+        skip = cached_texts.keys() | followers
+        if self.batch_mode:
+            units = self.split_batches(subtitles, skip=skip)
+            print(f"批量模式：{len(subtitles)} 条字幕合并为 {len(units)} 个请求")
+            scheduler = LaneScheduler(units, self.max_workers, weight=len)
+        else:
+            units = [position for position in range(len(subtitles)) if position not in skip]
+            scheduler = LaneScheduler(units, self.max_workers)
+        return translated_texts, scheduler
+
+    def classify_passthrough(self, subtitles, skip=None):
+        """
+        用本地预分类器找出无需翻译的字幕
+
+        :param skip: 不参与分类的位置（如已从断点日志恢复）
+        :return: {位置: 原文}
+        """
+        self.passthrough_count = 0
+        if not self.passthrough:
+            return {}
+        classifier = CueClassifier(self.target_language, self.source_language, sound_tags=self.passthrough_sound_tags)
+        reasons = classifier.classify_all(subtitles, skip=skip)
+        self.passthrough_count = len(reasons)
+        if reasons:
+            counts = Counter(reasons.values())
+            details = "，".join(f"{REASON_LABELS[reason]} {count}" for reason, count in counts.most_common())
+            print(f"预分类：{len(reasons)}/{len(subtitles)} 条字幕无需翻译，原样保留（{details}）")
+        return {position: subtitles[position].text for position in reasons}
+
+    def plan_deduplication(self, subtitles, cached_texts):
+        """
+        对待翻译的字幕去重
+
+        本任务中其他文件已完成的相同字幕直接写入 cached_texts；
+        同一文件内的重复字幕记为首次出现的字幕的跟随者，不单独翻译。
+        :return: 跟随者位置的集合
+        """
+        self._followers = {}
+        if self.deduplicator is None:
+            return set()
+
+        leaders = {}
+        reused = 0
+        for position, subtitle in enumerate(subtitles):
+            if position in cached_texts:
+                continue
+            key = self.deduplicator.key(subtitle.text)
+            if key is None:
+                continue
+            done_text = self.deduplicator.get(key)
+            if done_text is not None:
+                cached_texts[position] = done_text
+                reused += 1
+            elif key in leaders:
+                self._followers.setdefault(leaders[key], []).append(position)
+            else:
+                leaders[key] = position
+
+        follower_count = sum(len(positions) for positions in self._followers.values())
+        metrics.increment('dedup_reused', reused, scope=self.metrics_scope)
+        metrics.increment('dedup_followers', follower_count, scope=self.metrics_scope)
+        if reused or follower_count:
+            print(f"去重：{reused} 条字幕复用已有译文，{follower_count} 条重复字幕随首次出现的字幕一起翻译")
+        return {position for positions in self._followers.values() for position in positions}
+
+    def translate_lane(self, lane, subtitles, translated_texts):
+        """按顺序翻译一条车道，译文立即写回，供后续字幕作为上文"""
+        with metrics.scope(self.metrics_scope):
+            for unit in lane:
+                if self.batch_mode:
+                    results = self.safe_translate_batch(unit, subtitles, translated_texts)
                 else:
-                    prev_context.append(subtitles[i].text)
-            
-            # 获取未翻译的后文
-            next_context = subtitles[current_index+1:min(len(subtitles), current_index+11)]
-            next_text = "\n".join([s.text for s in next_context])
-            
-            max_retries = 3
-            for retry in range(max_retries):
+                    results = {unit: self.translate_deduplicated(unit, subtitles, translated_texts)}
+                self._store_results(results, subtitles, translated_texts)
+
+    def translate_deduplicated(self, position, subtitles, translated_texts):
+        """翻译单条字幕；其他文件正在翻译相同文本时等待并复用其译文"""
+        key = self.deduplicator.key(subtitles[position].text) if self.deduplicator is not None else None
+        if key is not None:
+            done_text = self.deduplicator.claim(key)
+            if done_text is not None:
+                return done_text
+        # 认领后由 _store_results 调用 resolve()，失败时也会唤醒等待者
+        try:
+            return self.safe_translate_subtitle(position, subtitles, translated_texts)
+        except BaseException:
+            # 构建提示词等步骤抛出异常时不会走到 _store_results，必须在这里释放认领，
+            # 否则等待相同文本的其他车道和文件会一直阻塞
+            if key is not None:
+                self.deduplicator.resolve(key, None)
+            raise
+
+    @staticmethod
+    def finish_translation(translated_texts):
+        """任务异常导致缺失的字幕标记为处理失败"""
+        return [text if text is not None else "[处理失败]" for text in translated_texts]
+
+    def _store_results(self, results, subtitles, translated_texts):
+        """写回一个单元的翻译结果 {位置: 译文}，并记入翻译记忆和断点日志；重复字幕一并写回"""
+        for position, translated_text in results.items():
+            failed = self.is_failed(translated_text)
+            if self.deduplicator is not None:
+                key = self.deduplicator.key(subtitles[position].text)
+                if key is not None:
+                    self.deduplicator.resolve(key, None if failed else translated_text)
+
+            for target in [position] + self._followers.get(position, []):
+                translated_texts[target] = translated_text
+                if failed:
+                    continue
+                if self.checkpoint is not None:
+                    self.checkpoint.record(target, translated_text)
+            if not failed:
+                self.remember(subtitles[position].text, translated_text)
+
+    async def translate_with_context_async(self, subtitles, async_translator=None, finished_texts=None):
+        """
+        asyncio 翻译引擎：由信号量限制在途请求数，单线程即可维持数百个并发请求
+        
+        :param subtitles: 所有字幕列表
+        :param async_translator: 可选的 AsyncTranslator，默认按 self.translator 的配置创建
+        :param finished_texts: 已完成的翻译 {位置: 译文}，不再重复请求
+        :return: 与字幕一一对应的翻译结果列表
+        """
+        # 延迟导入，线程池引擎不需要加载 aiohttp
+        from core.async_translator import AsyncTranslator
+
+        own_translator = async_translator is None
+        if own_translator:
+            async_translator = AsyncTranslator(self.translator.config)
+            async_translator.configure_pool(self.max_workers)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        translated_texts, scheduler = self.plan_translation(subtitles, finished_texts)
+
+        async def translate_one(position):
+            """翻译单条字幕，重试用尽后返回带错误标记的原文"""
+            subtitle = subtitles[position]
+            for retry in range(self.max_retries):
                 try:
-                    # 构建翻译提示
-                    translation_prompt = f"""
-                    你是一个专业的字幕翻译专家。以下是关于这个视频/内容的背景信息：
-    
-                    {context_summary}
-
-                    专用词汇列表（请在翻译时特别注意）：
-                    {"\n".join(self.custom_vocab) if self.custom_vocab else "无特殊词汇"}
-    
-                    翻译要求：
-                    1. 仅翻译"待翻译文本"部分
-                    2. 保持原文的语气和风格，调整为更符合中文语境和逻辑的表达。整体语言风格应略带轻松但专业，以适应DND视频观众的预期。
-                    3. 确保翻译自然流畅，便于视频观众理解，同时保留DND的奇幻氛围。
-                    4. 严格只返回翻译结果，不要添加任何其他内容
-                    5. 我会为你在待翻译文本前后提供它的上下文，请你不要翻译它们。
-                    6. 当前句子翻译需参考上下文，但不得提前翻译后续句子的具体内容。
-                    7. 翻译需为后续内容留出逻辑衔接空间，避免突兀地断句。
-                    8. 当句子逻辑复杂时，可根据中文习惯断句，并将部分内容转移到下一句。例子：
-                    示例：
-                    英文原文：
-                    第一句：
-                    MARISHA: I mean, we could Stone Shape it and I could like Stone Shape it and bury it somewhere in 
-                    第二句：
-                    our Keep.
-
-                    理想翻译：
-                    第一句：
-                    玛丽莎：我的意思是，我们可以用「塑石术」把它变成石头，然后——
-                    第二句：
-                    埋在我们的「灰颅堡」某个地方。
-
-                    9. 保持上下文的连贯性和整体语气一致，句间语义需自然衔接。
-                    10. 禁止重复翻译上下文内容，仅使用当前句的信息完成翻译。
-                    11. 程序会默认第一行为翻译结果，并自动截取第一行
-                    12. 有关专有名词和法术等，使用「」标注
-    
-                    已翻译上文（前10句）：
-                    {"\n".join(prev_context)}
-    
-                    待翻译文本：{subtitle.text}
-    
-                    未翻译下文（后10句）：
-                    {next_text}
-    
-                    请只返回待翻译文本的翻译结果。
-                    """
-                    
-                    # 尝试翻译
-                    translated_text = self.translator.translate(
-                        text=subtitle.text,
-                        system_prompt=translation_prompt,
-                        temperature=0.7
-                    )
-                    
-                    # 检查翻译结果
-                    if not translated_text or translated_text.strip() == '':
-                        raise ValueError("翻译结果为空")
-                    
-                    # 移除可能的额外描述
-                    translated_text = translated_text.strip().split('\n')[0].strip()
-                    
-                    return translated_text
-                
+                    async with semaphore:
+                        prev_context, next_text = self.get_context(position, subtitles, translated_texts)
+                        system_prompt, user_prompt = self.build_translation_prompt(subtitle, prev_context, next_text)
+                        translated_text = await async_translator.translate(
+                            text=user_prompt,
+                            system_prompt=system_prompt,
+                            temperature=0.7,
+                            **self.output_limits(subtitle.text)
+                        )
+                    return {position: self.clean_translation(translated_text)}
                 except Exception as e:
-                    # 记录错误
                     print(f"翻译字幕 {subtitle.index} 失败（第 {retry + 1} 次尝试）: {e}")
-                    
-                    # 最后一次重试仍失败
-                    if retry == max_retries - 1:
-                        # 根据错误类型选择不同的处理方式
-                        if isinstance(e, ValueError):
-                            # 如果是值错误（如空结果），返回原文并附加错误标记
-                            return f"[翻译失败] {subtitle.text}"
-                        else:
-                            # 对于其他类型错误，返回原文并附加详细错误信息
-                            return f"[翻译错误：{str(e)}] {subtitle.text}"
-                   # 重试间隔                    
-                    time.sleep(60)
+                    delay = self.retry_delay(retry, e)
+                    if delay is None or retry == self.max_retries - 1:
+                        return {position: self.failure_text(subtitle, e)}
+                    metrics.increment('retries')
+                    await asyncio.sleep(delay)
+            return {position: f"[翻译失败] {subtitle.text}"}
 
-            
-            # 理论上不会执行到这里，但保险起见
-            return f"[翻译失败] {subtitle.text}"
-    
-        # 使用线程池进行并发翻译
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 准备翻译任务
-            translation_futures = [
-                executor.submit(
-                    safe_translate_subtitle, 
-                    subtitle, 
-                    self.context_summary, 
-                    subtitles, 
-                    translated_texts
-                ) for subtitle in subtitles
-            ]
-            
-            # 收集翻译结果
-            for future in concurrent.futures.as_completed(translation_futures):
-                try:
-                    index = translation_futures.index(future)
-                    translated_text = future.result()
-                    translated_texts[index] = translated_text
-                except Exception as e:
-                    print(f"处理字幕翻译任务时发生异常: {e}")
-                    # 如果任务本身抛出异常，返回原文
-                    translated_texts[index] = "[处理失败]"
-            
-            return translated_texts
+        async def translate_batch(positions):
+            """翻译一批字幕，未能解析的编号改为逐条翻译"""
+            results = {}
+            try:
+                numbered_text, system_prompt, user_prompt = self.build_batch_prompt(
+                    positions, subtitles, translated_texts
+                )
+                async with semaphore:
+                    response = await async_translator.translate(
+                        text=user_prompt,
+                        system_prompt=system_prompt,
+                        temperature=0.7,
+                        **self.output_limits(numbered_text, len(positions))
+                    )
+                results = self.collect_batch_results(positions, response)
+            except Exception as e:
+                print(f"批量翻译字幕 {subtitles[positions[0]].index}-{subtitles[positions[-1]].index} 失败: {e}")
+
+            missing = [position for position in positions if position not in results]
+            for single_result in await asyncio.gather(*(translate_one(p) for p in missing)):
+                results.update(single_result)
+            return results
+
+        async def run_lane(lane):
+            """按顺序翻译一条车道，译文立即写回，供后续字幕作为上文"""
+            with metrics.scope(self.metrics_scope):
+                for unit in lane:
+                    if self.batch_mode:
+                        results = await translate_batch(unit)
+                    else:
+                        results = await translate_one(unit)
+                    self._store_results(results, subtitles, translated_texts)
 
-    def process_subtitle_file(self, file_path, target_language) -> Tuple[str, str]:
-        """完整的字幕处理流程，增加全面的错误处理"""
         try:
-            # 读取字幕文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 解析字幕
-            subtitles = self.parse_subtitles(content)
-            
-            # 检查是否有可翻译的字幕
-            if not subtitles:
-                raise ValueError(f"文件 {file_path} 中没有可翻译的字幕")
-            
-            # 提取纯文本用于分析
-            full_text = "\n".join([sub.text for sub in subtitles])
+            lane_results = await asyncio.gather(
+                *(run_lane(lane) for lane in scheduler), return_exceptions=True
+            )
+            for result in lane_results:
+                if isinstance(result, Exception):
+                    print(f"处理字幕翻译任务时发生异常: {result}")
+        finally:
+            if own_translator:
+                await async_translator.close()
+
+        return self.finish_translation(translated_texts)
+
+    def _memory_key(self, text):
+        """生成当前模型、语言对和专用词汇下的翻译记忆键"""
+        return self.translation_memory.make_key(
+            text,
+            getattr(self.translator, 'model', None),
+            self.source_language,
+            self.target_language,
+            self.translation_memory.vocab_hash(self.custom_vocab)
+        )
+
+    def lookup_memory(self, subtitles, skip=None):
+        """查询翻译记忆，返回 {位置: 译文}；skip 中的位置不查询"""
+        if self.translation_memory is None:
+            return {}
+        skip = skip or {}
+        cached_texts = {}
+        for position, subtitle in enumerate(subtitles):
+            if position in skip:
+                continue
+            cached_text = self.translation_memory.get(self._memory_key(subtitle.text))
+            if cached_text is not None:
+                cached_texts[position] = cached_text
+        return cached_texts
+
+    @staticmethod
+    def is_failed(translated_text):
+        """判断是否为翻译失败时的兜底文本"""
+        return (
+            not translated_text
+            or translated_text.startswith("[翻译失败]")
+            or translated_text.startswith("[翻译错误")
+            or translated_text.startswith("[处理失败]")
+        )
+
+    def remember(self, source_text, translated_text):
+        """将成功的翻译写入翻译记忆，失败标记不会被缓存"""
+        if self.translation_memory is None or self.is_failed(translated_text):
+            return
+        self.translation_memory.put(self._memory_key(source_text), translated_text)
+
+    def split_batches(self, subtitles, skip=None):
+        """
+        按token预算将连续的字幕切分为若干批次，预算扣除了提示词固定部分的开销
+        
+        :param subtitles: 所有字幕列表
+        :param skip: 无需翻译的字幕位置（如翻译记忆已命中、重复字幕），
+                     间隔不超过 MAX_BATCH_GAP 条时不会打断批次
+        :return: 每批字幕的位置元组
+        """
+        # 提示词中的固定部分（背景信息、词汇表、上下文）也占用预算，按第一批估算一次
+        _, system_prompt, user_prompt = self.build_batch_prompt((), subtitles)
+        prompt_overhead = self.count_tokens(system_prompt) + self.count_tokens(user_prompt)
+        budget = max(self.max_tokens - prompt_overhead, self.max_tokens // 4)
+
+        # 先按较大的间隔把待翻译的字幕分段，避免一批中的字幕相距太远
+        skip = skip or ()
+        runs = []
+        previous = None
+        for position in range(len(subtitles)):
+            if position in skip:
+                continue
+            if previous is None or position - previous > self.MAX_BATCH_GAP + 1:
+                runs.append([])
+            runs[-1].append(position)
+            previous = position
+
+        batches = []
+        for run in runs:
+            # 每行额外计入编号前缀的开销
+            chunks = chunk_by_tokens(
+                (subtitles[position].text for position in run), budget,
+                item_overhead=4, max_items=self.max_batch_size
+            )
+            batches.extend(tuple(run[start:end]) for start, end in chunks)
+        return batches
+
+    def parse_numbered_response(self, response, expected_count):
+        """
+        解析批量翻译返回的编号结果
+        
+        :param response: 模型返回的文本
+        :param expected_count: 本批字幕条数，编号从1开始
+        :return: {编号: 译文}，缺失或越界的编号不会出现在结果中
+        """
+        results = {}
+        for line in response.splitlines():
+            match = self.NUMBERED_LINE_PATTERN.match(line)
+            if not match:
+                continue
+            number = int(match.group(1))
+            text = match.group(2).strip()
+            if 1 <= number <= expected_count and text and number not in results:
+                results[number] = text
+        return results
+
+    def collect_batch_results(self, positions, response):
+        """将批量翻译的编号结果映射回字幕位置，返回 {位置: 译文}"""
+        parsed = self.parse_numbered_response(response or '', len(positions))
+        return {positions[number - 1]: text for number, text in parsed.items()}
+
+    def safe_translate_batch(self, positions, subtitles, translated_texts):
+        """
+        翻译一批字幕，未能解析的编号改为逐条翻译
+        
+        :param positions: 本批字幕的位置
+        :param subtitles: 所有字幕列表
+        :param translated_texts: 共享的翻译结果列表
+        :return: {位置: 译文}
+        """
+        results = {}
+        try:
+            numbered_text, system_prompt, user_prompt = self.build_batch_prompt(
+                positions, subtitles, translated_texts
+            )
+            response = self.translator.translate(
+                text=user_prompt,
+                system_prompt=system_prompt,
+                temperature=0.7,
+                **self.output_limits(numbered_text, len(positions))
+            )
+            results = self.collect_batch_results(positions, response)
+        except Exception as e:
+            print(f"批量翻译字幕 {subtitles[positions[0]].index}-{subtitles[positions[-1]].index} 失败: {e}")
+
+        missing = [position for position in positions if position not in results]
+        if missing:
+            print(f"批次 {subtitles[positions[0]].index}-{subtitles[positions[-1]].index} 中有 {len(missing)} 条未能解析，改为逐条翻译")
+            for position in missing:
+                results[position] = self.safe_translate_subtitle(position, subtitles, translated_texts)
+        return results
+
+    def process_subtitle_file(self, file_path, target_language, source_language=None,
+                              resume=False) -> Tuple[str, str]:
+        """
+        完整的字幕处理流程，增加全面的错误处理
+        
+        :param resume: 是否从断点日志恢复已完成的字幕，只翻译剩余部分
+        """
+        try:
+            source_hash, subtitles = self.load_subtitle_file(file_path)
             
-            # 设置目标语言
+            # 设置源语言和目标语言
             self.target_language = target_language
+            self.source_language = source_language
             
             # 第一阶段：分析内容
-            print("正在分析内容...")
-            context_summary = self.analyze_content(full_text)
-            
-            # 如果内容分析失败，使用默认提示词
-            if not context_summary:
-                context_summary = f"这是一个需要翻译的字幕文件。请保持原文的语气和风格。"
-            
-            print(f"内容分析完成: \n{context_summary}\n")
-            
-            # 将上下文摘要保存为实例变量
-            self.context_summary = context_summary
+            self.prepare_context(subtitles)
             
+            # 打开断点日志：每完成一条字幕就追加记录，进程中断后可续传
+            finished_texts = self.open_checkpoint(file_path, source_hash, resume)
+
             # 第二阶段：翻译字幕
             print("开始并发翻译...")
-            translated_texts = self.translate_with_context(subtitles)
-            
-            # 检查翻译结果
-            if len(translated_texts) != len(subtitles):
-                print(f"警告：翻译结果数量({len(translated_texts)})与原字幕数量({len(subtitles)})不符")
-            
-            # 重建字幕文件
-            output_content = self.rebuild_subtitles(subtitles, translated_texts)
-            
-            # 保存翻译结果
-            output_path = self._generate_output_path(file_path, target_language)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(output_content)
-            
-            # 保存分析报告
-            analysis_path = self._generate_analysis_path(file_path)
-            with open(analysis_path, 'w', encoding='utf-8') as f:
-                f.write(f"内容分析报告:\n{context_summary}")
-            
-            # 检查是否有翻译失败的字幕
-            failed_subtitles = [
-                text for text in translated_texts 
-                if text.startswith("[翻译失败]") or text.startswith("[翻译错误")
-            ]
+            try:
+                translated_texts = self.translate_with_context(subtitles, finished_texts=finished_texts)
+            finally:
+                self.checkpoint.close()
             
-            if failed_subtitles:
-                print(f"警告：{len(failed_subtitles)} 个字幕翻译失败")
-            
-            return output_path, analysis_path
+            return self.save_results(file_path, subtitles, translated_texts)
         
         except Exception as e:
             print(f"处理字幕文件 {file_path} 时发生错误: {e}")
             raise
 
+    def load_subtitle_file(self, file_path):
+        """
+        逐行读取并解析字幕文件，返回 (文件内容的 SHA-256 摘要, 字幕轨道 SubtitleTrack)
+
+        不保留文件全文：摘要在解析的同时逐行计算，供断点日志判断源文件是否变化。
+        """
+        hasher = hashlib.sha256()
+        with open(file_path, 'r', encoding='utf-8') as f:
+            subtitles = SubtitleTrack.parse(hashed_lines(f, hasher))
+        
+        # 检查是否有可翻译的字幕
+        if not subtitles:
+            raise ValueError(f"文件 {file_path} 中没有可翻译的字幕")
+        # 之后的请求和事件都计入该文件的指标
+        self.metrics_scope = file_path
+        return hasher.hexdigest(), subtitles
+
+    def prepare_context(self, subtitles):
+        """分析内容并将上下文摘要保存为实例变量"""
+        # 相同内容已分析过时直接复用报告
+        cache_key, cached_summary = self.lookup_analysis_cache(subtitles)
+        if cached_summary:
+            return cached_summary
+
+        # 提取纯文本用于分析
+        full_text = "\n".join([sub.text for sub in subtitles])
+        
+        print("正在分析内容...")
+        with metrics.scope(self.metrics_scope):
+            if self.analysis_mode == 'chunked':
+                context_summary = self.analyze_content_chunked(subtitles)
+            else:
+                context_summary = self.analyze_content(full_text)
+        return self.finish_context(context_summary, cache_key)
+
+    def lookup_analysis_cache(self, subtitles):
+        """
+        查找缓存的分析报告，命中时直接设为上下文摘要
+
+        :return: (缓存键, 缓存的报告)；未启用缓存时缓存键为None，未命中时报告为None
+        """
+        if self.analysis_cache is None:
+            return None, None
+        cache_key = self._analysis_cache_key(subtitles)
+        cached_summary = self.analysis_cache.get(cache_key)
+        if cached_summary:
+            print("使用缓存的内容分析报告")
+            metrics.increment('analysis_cache_hits', scope=self.metrics_scope)
+            self.context_summary = cached_summary
+        return cache_key, cached_summary
+
+    def finish_context(self, context_summary, cache_key=None):
+        """缓存分析报告并设为上下文摘要，分析失败时使用默认摘要"""
+        # 只缓存分析成功的报告，失败时下次仍会重新分析
+        if context_summary and cache_key is not None:
+            self.analysis_cache.put(cache_key, context_summary)
+        
+        # 如果内容分析失败，使用默认提示词
+        if not context_summary:
+            context_summary = f"这是一个需要翻译的字幕文件。请保持原文的语气和风格。"
+        
+        print(f"内容分析完成: \n{context_summary}\n")
+        
+        self.context_summary = context_summary
+        return context_summary
+
+    def _analysis_cache_key(self, subtitles):
+        """分析报告的缓存键：字幕文本、专用词汇、模型和分析方式"""
+        analysis_mode = self.analysis_mode
+        if analysis_mode == 'chunked':
+            analysis_mode = f"chunked:{self.analysis_chunk_tokens}"
+        return self.analysis_cache.make_key(
+            (subtitle.text for subtitle in subtitles),
+            self.custom_vocab,
+            getattr(self.translator, 'model', None),
+            analysis_mode
+        )
+
+    def open_checkpoint(self, file_path, source_hash, resume=False):
+        """打开输出文件旁的断点日志，返回从日志恢复的 {位置: 译文}"""
+        output_path = self._generate_output_path(file_path, self.target_language)
+        self.checkpoint = CheckpointJournal(self._generate_journal_path(output_path), source_hash)
+        finished_texts = self.checkpoint.open(resume=resume)
+        if finished_texts:
+            print(f"从断点日志恢复 {len(finished_texts)} 条已翻译字幕")
+        return finished_texts
+
+    def save_results(self, file_path, subtitles, translated_texts) -> Tuple[str, str]:
+        """保存译文和分析报告，全部成功时删除断点日志"""
+        # 检查翻译结果
+        if len(translated_texts) != len(subtitles):
+            print(f"警告：翻译结果数量({len(translated_texts)})与原字幕数量({len(subtitles)})不符")
+        
+        # 逐条写出译文，不在内存中拼接整个文件
+        output_path = self._generate_output_path(file_path, self.target_language)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            write_subtitles(f, subtitles, translated_texts)
+        
+        # 保存分析报告
+        analysis_path = self._generate_analysis_path(file_path)
+        with open(analysis_path, 'w', encoding='utf-8') as f:
+            f.write(f"内容分析报告:\n{self.context_summary}")
+        
+        # 检查是否有翻译失败的字幕
+        failed_subtitles = [text for text in translated_texts if self.is_failed(text)]
+        
+        metrics.increment('failures', len(failed_subtitles), scope=self.metrics_scope)
+        if failed_subtitles:
+            # 保留断点日志，重新运行时只需补译失败的字幕
+            print(f"警告：{len(failed_subtitles)} 个字幕翻译失败")
+        elif self.checkpoint is not None:
+            self.checkpoint.remove()
+        self.checkpoint = None
+
+        if self.translation_memory is not None:
+            stats = self.translation_memory.stats()
+            print(f"翻译记忆：命中 {stats['hits']} 次，未命中 {stats['misses']} 次，共 {stats['size']} 条")
+
+        # 本文件的运行指标与分析报告放在一起
+        print(f"本文件{metrics.summary(self.metrics_scope)}")
+        if self.metrics_format and self.metrics_format != 'none':
+            metrics.write(self._generate_metrics_base(file_path), self.metrics_scope, self.metrics_format)
+        
+        return output_path, analysis_path
+
+    def process_incremental(self, file_path, previous_source_path, target_language,
+                            source_language=None, previous_translation_path=None) -> Tuple[str, str]:
+        """
+        增量翻译：修改过的字幕文件只重新翻译改动或新增的字幕
+        
+        :param file_path: 修改后的字幕文件
+        :param previous_source_path: 生成现有译文时使用的原字幕文件
+        :param target_language: 目标语言
+        :param previous_translation_path: 现有译文，默认为修改后文件或原文件对应的 _translated_ 文件
+        :return: (输出文件路径, 分析报告路径)
+        """
+        if previous_translation_path is None:
+            previous_translation_path = self._generate_output_path(file_path, target_language)
+            if not os.path.exists(previous_translation_path):
+                previous_translation_path = self._generate_output_path(previous_source_path, target_language)
+
+        _, subtitles = self.load_subtitle_file(file_path)
+        with open(previous_source_path, 'r', encoding='utf-8') as f:
+            old_subtitles = self.parse_subtitles(f)
+        with open(previous_translation_path, 'r', encoding='utf-8') as f:
+            old_translations = self.parse_subtitles(f)
+
+        if len(old_translations) != len(old_subtitles):
+            raise ValueError(
+                f"现有译文 {previous_translation_path} 与原字幕 {previous_source_path} 的条数不一致，无法增量翻译"
+            )
+
+        self.target_language = target_language
+        self.source_language = source_language
+
+        # 对齐新旧字幕，未改动的字幕直接沿用现有译文
+        mapping = align_subtitles(old_subtitles, subtitles)
+        finished_texts = {
+            new_position: old_translations[old_position].text
+            for new_position, old_position in mapping.items()
+            if not self.is_failed(old_translations[old_position].text)
+        }
+        print(f"增量翻译：{len(finished_texts)}/{len(subtitles)} 条字幕沿用现有译文，"
+              f"{len(subtitles) - len(finished_texts)} 条需要翻译")
+
+        # 沿用现有的分析报告，找不到时才重新分析
+        self.context_summary = self._load_analysis_report(self._generate_analysis_path(file_path)) \
+            or self._load_analysis_report(self._generate_analysis_path(previous_source_path))
+        if not self.context_summary:
+            print("未找到现有分析报告")
+            self.prepare_context(subtitles)
+
+        translated_texts = self.translate_with_context(subtitles, finished_texts=finished_texts)
+        return self.save_results(file_path, subtitles, translated_texts)
+
+    def _load_analysis_report(self, analysis_path):
+        """读取已保存的分析报告，不存在时返回None"""
+        if not os.path.exists(analysis_path):
+            return None
+        with open(analysis_path, 'r', encoding='utf-8') as f:
+            report = f.read()
+        report = report.removeprefix("内容分析报告:\n").strip()
+        return report or None
+
     def rebuild_subtitles(self, original_subtitles, translated_texts):
         """重建SRT文件"""
-        rebuilt_content = []
-        for (subtitle, translated_text) in zip(original_subtitles, translated_texts):
-            subtitle_block = f"{subtitle.index}\n{subtitle.timestamp_in} --> {subtitle.timestamp_out}\n{translated_text}\n\n"
-            rebuilt_content.append(subtitle_block)
-        
-        return "".join(rebuilt_content)
+        buffer = io.StringIO()
+        write_subtitles(buffer, original_subtitles, translated_texts)
+        return buffer.getvalue()
+
+    def _output_base(self, input_path):
+        """输出文件的路径前缀：指定了输出目录时放到该目录下"""
+        base, ext = os.path.splitext(input_path)
+        if self.output_dir:
+            base = os.path.join(self.output_dir, os.path.basename(base))
+        return base, ext
 
     def _generate_output_path(self, input_path, target_language):
         """生成输出文件路径"""
-        base, ext = os.path.splitext(input_path)
+        base, ext = self._output_base(input_path)
         return f"{base}_translated_{target_language}{ext}"
 
+    def _generate_journal_path(self, output_path):
+        """生成断点日志文件路径（与输出文件放在一起）"""
+        return f"{output_path}.journal"
+
     def _generate_analysis_path(self, input_path):
         """生成分析报告文件路径"""
-        base, ext = os.path.splitext(input_path)
+        base, ext = self._output_base(input_path)
         return f"{base}_analysis.txt"
+
+    def _generate_metrics_base(self, input_path):
+        """生成指标文件路径（不含扩展名，按格式添加 .json / .prom）"""
+        base, ext = self._output_base(input_path)
+        return f"{base}_metrics"
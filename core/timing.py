@@ -0,0 +1,202 @@
+"""
+字幕时间轴批量处理：平移、帧率换算、消除重叠、合并过短字幕、阅读速度统计
+
+所有操作作用于整条 SubtitleTrack 的毫秒数组，安装了 NumPy 时向量化执行，
+否则退回纯 Python 实现，结果相同。操作不修改原轨道，而是返回新的轨道，
+可直接传给 rebuild_subtitles 或 SubtitleTrack.write 写回SRT。
+
+示例：
+    track = SubtitleTrack.from_subtitles(translator.parse_subtitles(content))
+    track = clamp_overlaps(rescale(shift(track, -1200), from_fps=25, to_fps=23.976))
+    content = translator.rebuild_subtitles(track, track.texts())
+"""
+from array import array
+
+from core.subtitle_track import SubtitleTrack
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+
+def _as_track(subtitles):
+    """接受 SubtitleTrack 或 parse_subtitles 返回的字幕列表"""
+    if isinstance(subtitles, SubtitleTrack):
+        return subtitles
+    return SubtitleTrack.from_subtitles(subtitles)
+
+
+def _to_numpy(values):
+    # array('q') 与 int64 内存布局一致，不需要复制
+    return np.frombuffer(values, dtype=np.int64)
+
+
+def _from_numpy(values):
+    return array('q', values.astype(np.int64).tobytes())
+
+
+def shift(subtitles, offset_ms):
+    """整体平移时间轴，结果小于0的时间按0处理"""
+    track = _as_track(subtitles)
+    offset_ms = int(offset_ms)
+    if np is not None:
+        starts = np.maximum(_to_numpy(track.starts) + offset_ms, 0)
+        ends = np.maximum(_to_numpy(track.ends) + offset_ms, 0)
+        return track.with_timing(_from_numpy(starts), _from_numpy(ends))
+    return track.with_timing(
+        [max(0, value + offset_ms) for value in track.starts],
+        [max(0, value + offset_ms) for value in track.ends]
+    )
+
+
+def rescale(subtitles, factor=None, from_fps=None, to_fps=None):
+    """
+    按比例缩放时间轴
+
+    :param factor: 缩放系数，新时间 = 原时间 × factor
+    :param from_fps: 字幕原本对应的帧率，与 to_fps 一起使用
+    :param to_fps: 目标视频的帧率；如 25 → 23.976 时时间轴会被拉长
+    """
+    if factor is None:
+        if not from_fps or not to_fps:
+            raise ValueError("需要指定 factor，或同时指定 from_fps 和 to_fps")
+        factor = from_fps / to_fps
+    track = _as_track(subtitles)
+    if np is not None:
+        starts = np.rint(_to_numpy(track.starts) * factor)
+        ends = np.rint(_to_numpy(track.ends) * factor)
+        return track.with_timing(_from_numpy(starts), _from_numpy(ends))
+    return track.with_timing(
+        [round(value * factor) for value in track.starts],
+        [round(value * factor) for value in track.ends]
+    )
+
+
+def clamp_overlaps(subtitles, min_gap=0):
+    """
+    截短与下一条字幕重叠的字幕，使两条之间至少间隔 min_gap 毫秒
+
+    结束时间不会早于本条的开始时间；轨道需按开始时间排序。
+    """
+    track = _as_track(subtitles)
+    if len(track) < 2:
+        return track
+    if np is not None:
+        starts = _to_numpy(track.starts)
+        ends = _to_numpy(track.ends).copy()
+        limits = starts[1:] - min_gap
+        ends[:-1] = np.maximum(np.minimum(ends[:-1], limits), starts[:-1])
+        return track.with_timing(track.starts, _from_numpy(ends))
+    starts = track.starts
+    ends = array('q', track.ends)
+    for position in range(len(track) - 1):
+        limit = starts[position + 1] - min_gap
+        if ends[position] > limit:
+            ends[position] = max(limit, starts[position])
+    return track.with_timing(starts, ends)
+
+
+def merge_short_cues(subtitles, min_duration=700, max_gap=200, separator="\n"):
+    """
+    把显示时间过短的字幕并入紧随其后的字幕
+
+    :param min_duration: 显示时间短于该值（毫秒）的字幕会被合并
+    :param max_gap: 与下一条字幕的间隔不超过该值（毫秒）时才合并
+    :param separator: 合并后文本之间的分隔符
+    :return: 新的轨道，序号重新从1编号
+    """
+    track = _as_track(subtitles)
+    count = len(track)
+    if count < 2:
+        return track
+
+    # 先批量计算哪些字幕需要并入下一条，再按顺序拼接
+    if np is not None:
+        starts = _to_numpy(track.starts)
+        ends = _to_numpy(track.ends)
+        merge_next = np.zeros(count, dtype=bool)
+        merge_next[:-1] = ((ends[:-1] - starts[:-1]) < min_duration) & ((starts[1:] - ends[:-1]) <= max_gap)
+        merge_next = merge_next.tolist()
+    else:
+        starts, ends = track.starts, track.ends
+        merge_next = [
+            position < count - 1
+            and ends[position] - starts[position] < min_duration
+            and starts[position + 1] - ends[position] <= max_gap
+            for position in range(count)
+        ]
+
+    new_starts, new_ends, new_texts = array('q'), array('q'), []
+    group_start = None
+    group_texts = []
+    for position in range(count):
+        if group_start is None:
+            group_start = track.starts[position]
+        group_texts.append(track.text_at(position))
+        if not merge_next[position]:
+            new_starts.append(group_start)
+            new_ends.append(track.ends[position])
+            new_texts.append(separator.join(text for text in group_texts if text))
+            group_start = None
+            group_texts = []
+    return SubtitleTrack(new_starts, new_ends, new_texts)
+
+
+def _text_lengths(track):
+    # 阅读速度只统计可见字符，不计换行和空格
+    return [len(''.join(text.split())) for text in track.texts()]
+
+
+def reading_speed(subtitles):
+    """每条字幕的阅读速度（字符/秒），显示时间为0的字幕记为0"""
+    track = _as_track(subtitles)
+    lengths = _text_lengths(track)
+    if np is not None:
+        durations = (_to_numpy(track.ends) - _to_numpy(track.starts)) / 1000.0
+        lengths = np.asarray(lengths, dtype=np.float64)
+        cps = np.divide(lengths, durations, out=np.zeros_like(lengths), where=durations > 0)
+        return cps.tolist()
+    return [
+        length / ((end - start) / 1000.0) if end > start else 0.0
+        for length, start, end in zip(lengths, track.starts, track.ends)
+    ]
+
+
+def reading_speed_stats(subtitles, max_cps=17.0):
+    """
+    统计整条轨道的阅读速度
+
+    :param max_cps: 阅读速度上限，超过的字幕计入 over_limit
+    :return: {'count', 'mean', 'median', 'p95', 'max', 'over_limit'}
+    """
+    cps = reading_speed(subtitles)
+    if not cps:
+        return {'count': 0, 'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'max': 0.0, 'over_limit': 0}
+    if np is not None:
+        values = np.asarray(cps)
+        return {
+            'count': len(cps),
+            'mean': float(values.mean()),
+            'median': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)),
+            'max': float(values.max()),
+            'over_limit': int((values > max_cps).sum())
+        }
+    values = sorted(cps)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'median': _percentile(values, 50),
+        'p95': _percentile(values, 95),
+        'max': values[-1],
+        'over_limit': sum(1 for value in values if value > max_cps)
+    }
+
+
+def _percentile(sorted_values, percent):
+    """线性插值百分位数，与 numpy.percentile 的默认算法一致"""
+    rank = (len(sorted_values) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
@@ -0,0 +1,226 @@
+"""
+进程内共享的分词器
+
+支持三种计数方式，通过 configure() 或配置项 default_settings.tokenizer 选择：
+    auto      只使用本地可用的编码文件（指定路径、SRT_TRANSLATOR_TOKENIZER_FILE、
+              assets/cl100k_base.tiktoken 或 tiktoken 自身的缓存），找不到时使用估算，从不联网
+    tiktoken  使用 tiktoken.get_encoding，首次使用可能需要下载编码文件，失败时改用估算
+    approx    按字符类别估算，不加载任何编码文件
+"""
+import os
+import re
+import math
+import base64
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+
+
+ENCODING_NAME = "cl100k_base"
+ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+ENCODING_FILE_ENV = "SRT_TRANSLATOR_TOKENIZER_FILE"
+BUNDLED_ENCODING_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'cl100k_base.tiktoken'
+)
+TOKENIZER_MODES = ('auto', 'tiktoken', 'approx')
+
+# cl100k_base 的切分规则与特殊token，从本地文件构建编码器时使用
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+CL100K_SPECIAL_TOKENS = {
+    "<|endoftext|>": 100257,
+    "<|fim_prefix|>": 100258,
+    "<|fim_middle|>": 100259,
+    "<|fim_suffix|>": 100260,
+    "<|endofprompt|>": 100276
+}
+
+# 只缓存较短的文本（字幕、词汇等会大量重复），长提示词直接计数，避免缓存占用过多内存
+MEMO_MAX_LENGTH = 512
+
+# 估算规则：按字符类别匹配，权重参照 cl100k_base 对各类文字的平均切分结果
+_APPROX_PATTERN = re.compile(
+    r'([㐀-䶿一-鿿豈-﫿])'  # 汉字
+    r'|([぀-ヿㇰ-ㇿｦ-ﾟ])'  # 假名
+    r'|([가-힯ᄀ-ᇿ㄰-㆏])'  # 谚文
+    r'|([^\W\d_㐀-䶿一-鿿豈-﫿぀-ヿㇰ-ㇿｦ-ﾟ가-힯ᄀ-ᇿ㄰-㆏]+)'  # 其他文字组成的单词
+    r'|(\d+)'
+    r'|(\S)'  # 标点与符号
+)
+_HAN_WEIGHT = 1.3
+_KANA_WEIGHT = 1.0
+_HANGUL_WEIGHT = 1.2
+_WORD_CHARS_PER_TOKEN = 4
+_DIGITS_PER_TOKEN = 3
+
+_mode = 'auto'
+_encoding_path = None
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def configure(mode='auto', encoding_path=None):
+    """
+    选择计数方式，清除已加载的编码器和计数缓存
+
+    :param mode: 'auto'、'tiktoken' 或 'approx'
+    :param encoding_path: 本地 .tiktoken 编码文件路径
+    """
+    global _mode, _encoding_path, _encoding, _encoding_loaded
+    if mode not in TOKENIZER_MODES:
+        raise ValueError(f"未知的分词方式: {mode}，可选 {', '.join(TOKENIZER_MODES)}")
+    with _encoding_lock:
+        _mode = mode
+        _encoding_path = encoding_path or None
+        _encoding = None
+        _encoding_loaded = False
+    _count_memoized.cache_clear()
+
+
+def _tiktoken_cache_path():
+    """tiktoken 自身缓存编码文件的位置（与 tiktoken.load.read_file_cached 一致）"""
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", os.environ.get("DATA_GYM_CACHE_DIR"))
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, hashlib.sha1(ENCODING_URL.encode()).hexdigest())
+
+
+def find_local_encoding_file():
+    """按优先级查找本地编码文件，找不到时返回None"""
+    candidates = [_encoding_path, os.environ.get(ENCODING_FILE_ENV), BUNDLED_ENCODING_PATH, _tiktoken_cache_path()]
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def load_encoding_file(path):
+    """从本地 .tiktoken 文件构建 cl100k_base 编码器，不访问网络"""
+    import tiktoken
+    with open(path, 'rb') as f:
+        mergeable_ranks = {
+            base64.b64decode(token): int(rank)
+            for token, rank in (line.split() for line in f if line.strip())
+        }
+    return tiktoken.Encoding(
+        name=ENCODING_NAME,
+        pat_str=CL100K_PATTERN,
+        mergeable_ranks=mergeable_ranks,
+        special_tokens=CL100K_SPECIAL_TOKENS
+    )
+
+
+def _load_encoding():
+    if _mode == 'approx':
+        return None
+    try:
+        import tiktoken
+    except ImportError:
+        print("Warning: tiktoken not installed. Token counting uses the approximate counter.")
+        return None
+
+    path = find_local_encoding_file()
+    if path:
+        try:
+            return load_encoding_file(path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: 无法读取编码文件 {path}: {e}")
+
+    if _mode == 'tiktoken':
+        try:
+            return tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            # 离线环境下载编码文件失败
+            print(f"Warning: 无法加载 {ENCODING_NAME} 编码: {e}，改用估算")
+    return None
+
+
+def get_encoding():
+    """进程内共享的 tiktoken 编码器，首次使用时加载；不可用或选择估算时返回None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                _encoding = _load_encoding()
+                _encoding_loaded = True
+    return _encoding
+
+
+def approximate_tokens(text):
+    """按字符类别估算token数：汉字、假名、谚文逐字计数，其他文字按单词长度估算"""
+    total = 0.0
+    for han, kana, hangul, word, digits, _ in _APPROX_PATTERN.findall(text):
+        if han:
+            total += _HAN_WEIGHT
+        elif kana:
+            total += _KANA_WEIGHT
+        elif hangul:
+            total += _HANGUL_WEIGHT
+        elif word:
+            total += math.ceil(len(word) / _WORD_CHARS_PER_TOKEN)
+        elif digits:
+            total += math.ceil(len(digits) / _DIGITS_PER_TOKEN)
+        else:
+            total += 1
+    return math.ceil(total)
+
+
+def _count(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=65536)
+def _count_memoized(text):
+    return _count(text)
+
+
+def count_tokens(text):
+    """统计文本的token数，重复出现的短文本直接返回缓存结果"""
+    if not text:
+        return 0
+    if len(text) <= MEMO_MAX_LENGTH:
+        return _count_memoized(text)
+    return _count(text)
+
+
+def chunk_by_tokens(texts, max_tokens, item_overhead=0, max_items=None, skip=None):
+    """
+    按token预算把连续的文本切分为若干组
+
+    单条文本超出预算时自成一组，不会被截断。
+
+    :param texts: 文本序列（如每条字幕的文本）
+    :param max_tokens: 每组的token预算
+    :param item_overhead: 每条文本额外计入的token数（如编号前缀）
+    :param max_items: 每组最多包含的条数
+    :param skip: 不参与分组的位置，会打断当前分组
+    :return: 每组在序列中的位置区间 [(start, end), ...]
+    """
+    skip = skip or ()
+    chunks = []
+    start = 0
+    budget_used = 0
+    position = -1
+    for position, text in enumerate(texts):
+        if position in skip:
+            if position > start:
+                chunks.append((start, position))
+            start = position + 1
+            budget_used = 0
+            continue
+        cost = count_tokens(text) + item_overhead
+        chunk_len = position - start
+        if chunk_len and (budget_used + cost > max_tokens or (max_items and chunk_len >= max_items)):
+            chunks.append((start, position))
+            start = position
+            budget_used = 0
+        budget_used += cost
+    if start <= position:
+        chunks.append((start, position + 1))
+    return chunks
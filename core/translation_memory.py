@@ -0,0 +1,117 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class TranslationMemory:
+    """基于SQLite的本地翻译记忆库，跨运行、跨剧集复用已翻译的字幕"""
+
+    def __init__(self, db_path='translation_memory.db', max_entries=200000):
+        self.db_path = db_path
+        self.max_entries = max_entries  # 超过该条目数时按最近使用时间淘汰
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts_since_eviction = 0
+
+        # 多个翻译线程共用一个连接，由锁保证串行访问
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_text(text):
+        """归一化原文：去除首尾空白并合并连续空白"""
+        return re.sub(r'\s+', ' ', text).strip()
+
+    @staticmethod
+    def vocab_hash(custom_vocab):
+        """计算专用词汇列表的哈希，词汇变化后旧的翻译不再命中"""
+        return hashlib.sha256("\n".join(custom_vocab or []).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def make_key(cls, text, model, source_lang, target_lang, vocab_hash):
+        """由原文、模型、语言对和词汇哈希生成缓存键"""
+        raw = "\x1f".join([
+            cls.normalize_text(text),
+            model or '',
+            source_lang or '',
+            target_lang or '',
+            vocab_hash or ''
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """查询翻译记忆，未命中返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, translation):
+        """写入一条翻译结果"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, last_used) VALUES (?, ?, ?)",
+                (key, translation, time.time())
+            )
+            self._conn.commit()
+            self._puts_since_eviction += 1
+            # 每写入一定数量后检查一次容量，避免每次写入都统计行数
+            if self._puts_since_eviction >= 1000:
+                self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，保留 max_entries 的90%"""
+        self._puts_since_eviction = 0
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM translations WHERE key IN "
+            "(SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': size
+        }
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
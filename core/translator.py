@@ -1,7 +1,76 @@
 import requests
 import json
-import tiktoken
-import traceback
+import time
+import threading
+from requests.adapters import HTTPAdapter
+
+from core.rate_limiter import RateLimiter
+from core import tokenizer
+from core.metrics import metrics, provider_name
+
+
+def parse_sse_line(line):
+    """
+    解析一行SSE流式响应
+
+    :return: (是否结束, 文本增量, usage)，非数据行返回 (False, '', None)
+    """
+    if not line.startswith('data:'):
+        return False, '', None
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return True, '', None
+    chunk = json.loads(data)
+    choices = chunk.get('choices') or []
+    delta = (choices[0].get('delta') or {}) if choices else {}
+    return False, delta.get('content') or '', chunk.get('usage')
+
+
+def count_complete_lines(text):
+    """已完整输出（后面已有换行）的非空行数"""
+    return sum(1 for line in text.split('\n')[:-1] if line.strip())
+
+
+def build_payload(model, text, system_prompt=None, temperature=0.7, max_tokens=None, stop=None, stream=False):
+    """构建 /chat/completions 请求体，Translator 与 AsyncTranslator 共用"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": text})
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature
+    }
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    if stop:
+        payload["stop"] = stop
+    if stream:
+        payload["stream"] = True
+        # 要求在最后一个数据块中返回 usage，用于统计token和费用
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+def record_usage(provider, model, usage, system_prompt, text, translated_text, count=tokenizer.count_tokens):
+    """
+    记录一次请求的token用量
+
+    优先使用响应中的 usage；流式响应提前断开等情况下没有 usage，按本地计数估算
+    （只计入已收到的输出）。
+    """
+    if usage and usage.get('prompt_tokens') is not None:
+        metrics.record_usage(provider, model, usage.get('prompt_tokens'), usage.get('completion_tokens'))
+    else:
+        metrics.record_usage(
+            provider, model,
+            count(system_prompt or '') + count(text),
+            count(translated_text or ''),
+            estimated=True
+        )
+
 
 class Translator:
     def __init__(self, config):
@@ -10,20 +79,76 @@ class Translator:
         self.api_key = config.get('api_key')
         self.api_type = config.get('api_type', 'openai')
         self.model = config.get('model', 'gpt-3.5-turbo')
-        
-        # 初始化分词器
-        try:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        except ImportError:
-            print("Warning: tiktoken not installed. Token counting disabled.")
-            self.tokenizer = None
+
+        # 连接池与超时设置（秒），超时避免单个卡住的连接永久占用工作线程
+        self.connect_timeout = config.get('connect_timeout', 10)
+        self.read_timeout = config.get('read_timeout', 120)
+        self.pool_size = config.get('pool_size', 10)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        # 流式接收响应：收到所需行数后即可关闭连接，不再为模型附加的解释付费
+        self.stream = config.get('stream', False)
+
+        # 同一服务商的所有翻译器共享限流额度（未配置RPM/TPM时只跟踪响应头）
+        self.rate_limiter = RateLimiter.for_provider(
+            self.base_url,
+            config.get('requests_per_minute'),
+            config.get('tokens_per_minute')
+        )
+
+    @property
+    def tokenizer(self):
+        """进程内共享的分词器，首次计数时才加载"""
+        return tokenizer.get_encoding()
+
+    def configure_pool(self, pool_size):
+        """按并发数调整连接池大小，已建立的会话会被重建"""
+        with self._session_lock:
+            if pool_size == self.pool_size and self._session is not None:
+                return
+            self.pool_size = pool_size
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @property
+    def session(self):
+        """线程共享的长连接会话，首次使用时创建"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # 不使用 pool_block：等待空闲连接不受连接/读取超时限制，一个未归还的连接就会让线程永久阻塞；
+                    # 连接数超过上限时临时新建连接，用完后关闭，池中最多保留 pool_size 个长连接
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_size
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        """关闭连接池"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
 
     def count_tokens(self, text):
-        if self.tokenizer:
-            return len(self.tokenizer.encode(text))
-        return len(text.split())  # 简单的备选方案
+        return tokenizer.count_tokens(text)
 
-    def translate(self, text, source_lang=None, target_lang=None, system_prompt=None, temperature=0.7):
+    def translate(self, text, source_lang=None, target_lang=None, system_prompt=None, temperature=0.7,
+                  max_tokens=None, stop=None, max_lines=None):
+        """
+        调用 /chat/completions 翻译文本
+
+        :param max_tokens: 输出token上限
+        :param stop: 停止序列列表
+        :param max_lines: 流式模式下收到这么多行非空输出后立即断开，不再接收其余内容
+        """
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -33,47 +158,80 @@ class Translator:
         if not text or text.strip() == '':
             return ''
 
-        # 构建消息列表
-        messages = []
-        
-        # 添加系统提示词
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        
-        # 添加用户消息
-        messages.append({"role": "user", "content": text})
-
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature
-        }
+        payload = build_payload(
+            self.model, text, system_prompt, temperature,
+            max_tokens=max_tokens, stop=stop, stream=self.stream
+        )
 
+        # 按预计的token数预占限流额度
+        estimated_tokens = 0
+        if self.rate_limiter.tokens_per_minute:
+            estimated_tokens = self.count_tokens(system_prompt or '') + self.count_tokens(text)
+        self.rate_limiter.acquire(estimated_tokens)
+
+        provider = provider_name(self.base_url)
+        outcome = 'error'
+        started = time.monotonic()
         try:
-            response = requests.post(
+            # 流式响应在读完前一直占用连接，出错时也必须关闭，否则连接不会回到连接池
+            with self.session.post(
                 f"{self.base_url}/chat/completions", 
                 headers=headers, 
-                json=payload
-            )
-            
-            # 打印完整的响应内容，帮助诊断问题
-            print(f"Response status: {response.status_code}")
-            print(f"Response content: {response.text}")
-            
-            response.raise_for_status()
-            
-            # 解析响应
-            result = response.json()
-            translated_text = result['choices'][0]['message']['content'].strip()
-            
-            return translated_text
-        
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout),
+                stream=self.stream
+            ) as response:
+                self.rate_limiter.update_from_headers(response.headers)
+                if response.status_code == 429:
+                    outcome = 'rate_limited'
+                response.raise_for_status()
+
+                if self.stream:
+                    translated_text, usage = self._read_stream(response, max_lines)
+                else:
+                    # 解析响应
+                    result = response.json()
+                    usage = result.get('usage')
+                    translated_text = result['choices'][0]['message']['content'].strip()
+            outcome = 'success'
+
         except requests.RequestException as e:
+            # 只输出状态和错误信息，不输出响应内容
             print(f"Translation error: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
-            print(f"Response content: {e.response.text if hasattr(e, 'response') else 'No response'}")
             raise
         except json.JSONDecodeError as e:
             print(f"JSON Decode error: {e}")
-            print(f"Response content: {response.text}")
             raise
+        finally:
+            metrics.record_request(provider, self.model, time.monotonic() - started, outcome)
+
+        self.rate_limiter.settle(estimated_tokens, (usage or {}).get('total_tokens'))
+        record_usage(provider, self.model, usage, system_prompt, text, translated_text)
+        return translated_text
+
+    def _read_stream(self, response, max_lines=None):
+        """
+        读取SSE响应，返回 (文本, 服务端报告的 usage)
+
+        收到 max_lines 行后关闭响应；提前断开的连接不会回到连接池，
+        但省下的生成时间和输出token通常远多于重新建立连接的开销。
+        """
+        # SSE 响应通常不声明编码，requests 会按 ISO-8859-1 解码
+        response.encoding = 'utf-8'
+        parts = []
+        usage = None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                finished, content, chunk_usage = parse_sse_line(line)
+                if chunk_usage:
+                    usage = chunk_usage
+                if finished:
+                    break
+                parts.append(content)
+                if max_lines and '\n' in content and count_complete_lines(''.join(parts)) >= max_lines:
+                    break
+        finally:
+            response.close()
+        return ''.join(parts).strip(), usage